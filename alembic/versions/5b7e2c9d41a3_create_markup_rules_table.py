@@ -0,0 +1,44 @@
+"""create markup_rules table
+
+Revision ID: 5b7e2c9d41a3
+Revises: 31208e7daede
+Create Date: 2026-10-17 10:12:41.210334
+
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2c9d41a3'
+down_revision: Union[str, None] = '31208e7daede'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    markup_rules = op.create_table('markup_rules',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('tier', sa.String(length=32), nullable=False),
+    sa.Column('kind', sa.String(length=8), nullable=False),
+    sa.Column('value', sa.Numeric(precision=12, scale=6), nullable=False),
+    sa.Column('effective_from', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('currency', 'tier', 'effective_from')
+    )
+    # The formulas previously hardcoded in the bot and the controller
+    op.bulk_insert(markup_rules, [
+        {'currency': 'USD', 'tier': 'default', 'kind': 'add', 'value': Decimal('1.00'), 'effective_from': date(1970, 1, 1)},
+        {'currency': 'CNY', 'tier': 'default', 'kind': 'mul', 'value': Decimal('1.02'), 'effective_from': date(1970, 1, 1)},
+    ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('markup_rules')
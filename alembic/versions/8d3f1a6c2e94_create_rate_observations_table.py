@@ -0,0 +1,48 @@
+"""create rate_observations table
+
+Revision ID: 8d3f1a6c2e94
+Revises: 5b7e2c9d41a3
+Create Date: 2026-10-17 11:40:02.518377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f1a6c2e94'
+down_revision: Union[str, None] = '5b7e2c9d41a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rate_observations',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('pair', sa.String(length=7), nullable=False),
+    sa.Column('source', sa.String(length=32), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('observed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('value_minor', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('pair', 'source', 'date')
+    )
+    op.create_index('ix_rate_observations_pair_date', 'rate_observations', ['pair', 'date'],
+                    unique=False, postgresql_include=['source', 'value_minor'])
+
+    # Move the existing daily rates over, one row per pair
+    op.execute("""
+        INSERT INTO rate_observations (pair, source, date, observed_at, value_minor)
+        SELECT 'USD/RUB', 'manual', date, CAST(date AS TIMESTAMP) AT TIME ZONE 'UTC', ust_rub_cents FROM rates
+        UNION ALL
+        SELECT 'CNY/RUB', 'manual', date, CAST(date AS TIMESTAMP) AT TIME ZONE 'UTC', cny_rub_fens FROM rates
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_rate_observations_pair_date', table_name='rate_observations')
+    op.drop_table('rate_observations')
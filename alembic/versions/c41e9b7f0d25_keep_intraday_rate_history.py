@@ -0,0 +1,72 @@
+"""keep intraday rate history
+
+Revision ID: c41e9b7f0d25
+Revises: 8d3f1a6c2e94
+Create Date: 2026-10-17 14:05:18.903112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e9b7f0d25'
+down_revision: Union[str, None] = '8d3f1a6c2e94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Observations become append-only: one row per submission instead of per day
+    op.drop_constraint('rate_observations_pair_source_date_key', 'rate_observations', type_='unique')
+    op.create_unique_constraint('rate_observations_pair_source_observed_at_key', 'rate_observations',
+                                ['pair', 'source', 'observed_at'])
+    # Several observations per day are read in observed_at order: keep the scan index-only
+    op.drop_index('ix_rate_observations_pair_date', table_name='rate_observations')
+    op.create_index('ix_rate_observations_pair_date', 'rate_observations', ['pair', 'date', 'observed_at'],
+                    unique=False, postgresql_include=['source', 'value_minor'])
+
+    op.create_table('rate_daily_ohlc',
+    sa.Column('pair', sa.String(length=7), nullable=False),
+    sa.Column('source', sa.String(length=32), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('open_minor', sa.BigInteger(), nullable=False),
+    sa.Column('high_minor', sa.BigInteger(), nullable=False),
+    sa.Column('low_minor', sa.BigInteger(), nullable=False),
+    sa.Column('close_minor', sa.BigInteger(), nullable=False),
+    sa.Column('sum_minor', sa.BigInteger(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('opened_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('closed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('pair', 'source', 'date')
+    )
+
+    # Until now there was a single observation per pair, source and day
+    op.execute("""
+        INSERT INTO rate_daily_ohlc (pair, source, date, open_minor, high_minor, low_minor, close_minor,
+                                     sum_minor, count, opened_at, closed_at)
+        SELECT pair, source, date, value_minor, value_minor, value_minor, value_minor,
+               value_minor, 1, observed_at, observed_at
+        FROM rate_observations
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rate_daily_ohlc')
+    # Keep only the latest observation per day so the old unique constraint can be restored
+    op.execute("""
+        DELETE FROM rate_observations o
+        USING rate_observations newer
+        WHERE newer.pair = o.pair AND newer.source = o.source AND newer.date = o.date
+          AND newer.observed_at > o.observed_at
+    """)
+    op.drop_index('ix_rate_observations_pair_date', table_name='rate_observations')
+    op.create_index('ix_rate_observations_pair_date', 'rate_observations', ['pair', 'date'],
+                    unique=False, postgresql_include=['source', 'value_minor'])
+    op.drop_constraint('rate_observations_pair_source_observed_at_key', 'rate_observations', type_='unique')
+    op.create_unique_constraint('rate_observations_pair_source_date_key', 'rate_observations',
+                                ['pair', 'source', 'date'])
@@ -0,0 +1,87 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Iterable, Protocol
+
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramAPIError
+
+from logger import setup_logger
+
+logger = setup_logger(__name__, level="INFO")
+
+# Telegram allows about 30 messages per second overall and one per second per chat
+GLOBAL_RATE = 25.0
+PER_CHAT_INTERVAL = 1.0
+MAX_CONCURRENCY = 20
+MAX_ATTEMPTS = 3
+
+
+class MessageSender(Protocol):
+    async def send_message(self, chat_id: int, text: str, **kwargs): ...
+
+
+@dataclass
+class Delivery:
+    chat_id: int
+    status: str          # "sent", "failed" or "forbidden" (bot was removed or blocked)
+    attempts: int
+    error: str | None = None
+
+
+class SendRateLimiter:
+    """Hands out send slots that respect a global rate and a minimum interval per chat."""
+
+    def __init__(self, rate: float = GLOBAL_RATE, per_chat_interval: float = PER_CHAT_INTERVAL):
+        self.interval = 1 / rate
+        self.per_chat_interval = per_chat_interval
+        self._next_global = 0.0
+        self._next_by_chat: dict[int, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, chat_id: int) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next_global, self._next_by_chat.get(chat_id, 0.0))
+            self._next_global = slot + self.interval
+            self._next_by_chat[chat_id] = slot + self.per_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        """Flood control hit: push every following slot back."""
+        resume = asyncio.get_running_loop().time() + seconds
+        self._next_global = max(self._next_global, resume)
+
+
+class Announcer:
+    """Sends one text to many chats concurrently within Telegram's limits."""
+
+    def __init__(self, bot: MessageSender, concurrency: int = MAX_CONCURRENCY,
+                 limiter: SendRateLimiter | None = None, max_attempts: int = MAX_ATTEMPTS):
+        self.bot = bot
+        self.limiter = limiter or SendRateLimiter()
+        self.max_attempts = max_attempts
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def broadcast(self, chat_ids: Iterable[int], text: str) -> list[Delivery]:
+        return await asyncio.gather(*(self._deliver(chat_id, text) for chat_id in dict.fromkeys(chat_ids)))
+
+    async def _deliver(self, chat_id: int, text: str) -> Delivery:
+        async with self._semaphore:
+            error = None
+            for attempt in range(1, self.max_attempts + 1):
+                await self.limiter.wait(chat_id)
+                try:
+                    await self.bot.send_message(chat_id, text)
+                    return Delivery(chat_id, "sent", attempt)
+                except TelegramRetryAfter as e:
+                    error = str(e)
+                    self.limiter.pause(e.retry_after)
+                except TelegramForbiddenError as e:
+                    return Delivery(chat_id, "forbidden", attempt, str(e))
+                except TelegramAPIError as e:
+                    error = str(e)
+                except Exception as e:
+                    error = str(e)
+                    logger.warning(f"Ошибка отправки в чат {chat_id}: {e}")
+            return Delivery(chat_id, "failed", self.max_attempts, error)
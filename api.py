@@ -1,18 +1,82 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, Request
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from functools import cache
 from datetime import date, timedelta
-from typing import Optional, List, AsyncGenerator
+from decimal import Decimal
+from typing import Optional, List, AsyncGenerator, AsyncIterator, Iterator, Literal
 from sqlalchemy.ext.asyncio import AsyncSession
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
-from database import get_session
+from database import get_engine, get_session, warm_up_pool, dispose_engine
 from controllers import CurrencyController
+from broadcast import broadcaster, listen_for_updates
+from webhook import router as webhook_router, webhook_enabled, start_webhook, stop_webhook
+from http_cache import conditional_json, conditional_response, cache_control_for, RenderedPage, page_response
+from cache import page_cache, MISSING
+from markup import DEFAULT_TIER
+from money import MINOR_UNITS, RATE_DIGITS
+from export import export_chunks
+from serializers import rate_to_dict, encode_rate, encode_rates, encode_rates_ndjson, encode_rate_as_of, encode_conversion
+from metrics import METRICS_ENABLED, MetricsMiddleware, CONTENT_TYPE, render as render_metrics
 
-app = FastAPI(title="Currency Rates API")
-templates = Jinja2Templates(directory="templates")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_up_pool()
+    listener = None
+    engine = get_engine()
+    if engine.dialect.name == "postgresql":
+        listener = asyncio.create_task(listen_for_updates(engine))
+    if webhook_enabled():
+        await start_webhook()
+    yield
+    if webhook_enabled():
+        await stop_webhook()
+    if listener:
+        listener.cancel()
+        # Let it release its connection before the engine goes away
+        await asyncio.gather(listener, return_exceptions=True)
+    await dispose_engine()
+
+
+router = APIRouter()
+
+
+def create_app() -> FastAPI:
+    """Build the API; `uvicorn api:create_app --factory` skips building anything at import time."""
+    from fastapi.staticfiles import StaticFiles
+
+    app = FastAPI(title="Currency Rates API", lifespan=lifespan)
+    app.mount("/static", StaticFiles(directory="static"), name="static")
+    app.include_router(router)
+    app.include_router(webhook_router)
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+_app: FastAPI | None = None
+
+
+def __getattr__(name: str):
+    # `uvicorn api:app` and `api.app` get one shared app, built on first access
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@cache
+def get_templates():
+    from fastapi.templating import Jinja2Templates
+
+    return Jinja2Templates(directory="templates")
 
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
     async with get_session() as session:
@@ -29,8 +93,224 @@ class CurrencyRatesResponse(BaseModel):
         from_attributes = True
 
 
-@app.get("/rates/today", response_model=CurrencyRatesResponse)
-async def get_today_rates(session: AsyncSession = Depends(get_db_session)):
+class AsOfRequest(BaseModel):
+    dates: List[date]
+
+
+class ConversionItem(BaseModel):
+    amount: Decimal
+    currency: Literal["USD", "CNY"]
+    date: date
+    # null converts at the base rate without markup
+    tier: Optional[str] = DEFAULT_TIER
+
+
+class ConversionRequest(BaseModel):
+    items: List[ConversionItem]
+
+
+STREAM_CHUNK_ROWS = 500
+MAX_PAGE_SIZE = 10000
+MAX_AS_OF_DATES = 100_000
+MAX_CONVERSION_ITEMS = 1_000_000
+CONVERSION_CHUNK_ITEMS = 5000
+
+
+async def stream_rates(from_date: Optional[date], to_date: Optional[date], fmt: str) -> AsyncIterator[bytes]:
+    # The request-scoped session is closed before a streaming body is sent, so open our own
+    async with get_session() as session:
+        controller = CurrencyController(session)
+        if fmt == "json":
+            yield b"["
+
+        chunk = []
+        first = True
+        async for r in controller.stream_rates_range(from_date, to_date, chunk_size=STREAM_CHUNK_ROWS):
+            chunk.append(r)
+            if len(chunk) == STREAM_CHUNK_ROWS:
+                yield _encode_chunk(chunk, fmt, first)
+                first = False
+                chunk = []
+
+        if chunk:
+            yield _encode_chunk(chunk, fmt, first)
+        if fmt == "json":
+            yield b"]"
+
+
+def _encode_chunk(chunk: list, fmt: str, first: bool) -> bytes:
+    if fmt == "ndjson":
+        return encode_rates_ndjson(chunk)
+    return (b"" if first else b",") + b",".join(encode_rate(r) for r in chunk)
+
+
+@router.get("/rates/stream")
+async def get_rates_stream(
+    from_date: Optional[date] = Query(None),
+    to_date: Optional[date] = Query(None),
+    format: Literal["ndjson", "json"] = Query("ndjson"),
+):
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    return StreamingResponse(stream_rates(from_date, to_date, format), media_type=media_type)
+
+
+EXPORT_CHUNK_ROWS = 5000
+
+
+async def export_rates(from_date: Optional[date], to_date: Optional[date], fmt: str) -> AsyncIterator[bytes]:
+    async with get_session() as session:
+        controller = CurrencyController(session)
+        rows = controller.stream_rates_range(from_date, to_date, chunk_size=EXPORT_CHUNK_ROWS)
+        async for chunk in export_chunks(rows, fmt, EXPORT_CHUNK_ROWS):
+            yield chunk
+
+
+@router.get("/rates/export")
+async def get_rates_export(
+    from_date: Optional[date] = Query(None),
+    to_date: Optional[date] = Query(None),
+    format: Literal["csv", "columnar"] = Query("csv"),
+):
+    if format == "csv":
+        media_type, filename = "text/csv", "rates.csv"
+    else:
+        media_type, filename = "application/octet-stream", "rates.ratecol"
+    return StreamingResponse(
+        export_rates(from_date, to_date, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+async def check_tiers(controller: CurrencyController, tiers: set) -> None:
+    """422 for tiers without markup rules, rather than quietly pricing them at the default markup."""
+    markups = await controller.get_markup_engine()
+    unknown = tiers - markups.tiers() - {DEFAULT_TIER}
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown tier: {', '.join(sorted(unknown))}")
+
+
+@router.get("/rates/markup")
+async def get_rates_with_markup(
+    request: Request,
+    tier: str = Query(DEFAULT_TIER),
+    from_date: Optional[date] = Query(None),
+    to_date: Optional[date] = Query(None),
+    session: AsyncSession = Depends(get_db_session)
+):
+    controller = CurrencyController(session)
+    await check_tiers(controller, {tier})
+    rates = await controller.get_rates_with_markup(from_date, to_date, tier)
+    return conditional_json(request, rates, cache_control_for(to_date))
+
+
+@router.get("/rates/pairs")
+async def get_pair_rates(
+    request: Request,
+    pair: List[str] = Query(..., description="Currency pair such as USD/RUB, repeat for several pairs"),
+    from_date: Optional[date] = Query(None),
+    to_date: Optional[date] = Query(None),
+    source: Optional[str] = Query(None),
+    session: AsyncSession = Depends(get_db_session)
+):
+    controller = CurrencyController(session)
+    by_pair = await controller.get_pair_rates(pair, from_date, to_date, source)
+    return conditional_json(request, {
+        name: [
+            {"date": r.date, "source": r.source, "observed_at": r.observed_at, "value": r.value_minor / MINOR_UNITS}
+            for r in rows
+        ]
+        for name, rows in by_pair.items()
+    }, cache_control_for(to_date))
+
+
+@router.get("/rates/ohlc")
+async def get_rates_ohlc(
+    request: Request,
+    pair: str = Query(...),
+    interval: Literal["day", "week", "month"] = Query("day"),
+    from_date: Optional[date] = Query(None),
+    to_date: Optional[date] = Query(None),
+    source: Optional[str] = Query(None),
+    session: AsyncSession = Depends(get_db_session)
+):
+    controller = CurrencyController(session)
+    bars = await controller.get_ohlc(pair, interval, from_date, to_date, source)
+    return conditional_json(request, [
+        {
+            "period": b.period,
+            "source": b.source,
+            "open": b.open_minor / MINOR_UNITS,
+            "high": b.high_minor / MINOR_UNITS,
+            "low": b.low_minor / MINOR_UNITS,
+            "close": b.close_minor / MINOR_UNITS,
+            "average": round(b.sum_minor / b.count / MINOR_UNITS, RATE_DIGITS + 2),
+            "count": b.count,
+        } for b in bars
+    ], cache_control_for(to_date))
+
+
+SSE_HEARTBEAT_SECONDS = 15
+
+
+async def rate_events(request: Request) -> AsyncIterator[bytes]:
+    async with broadcaster.subscribe() as queue:
+        yield b": connected\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection
+                yield b": ping\n\n"
+                continue
+            yield event.sse
+
+
+@router.get("/rates/events")
+async def get_rate_events(request: Request):
+    """Server-sent events: `rates` with the saved day's rates, `reload` after bulk changes."""
+    return StreamingResponse(
+        rate_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws/rates")
+async def rates_websocket(websocket: WebSocket):
+    await websocket.accept()
+    async with broadcaster.subscribe() as queue:
+        # Clients only listen, but reading is what notices a closed socket between
+        # events, which may be hours apart; otherwise its subscription lingers
+        closed = asyncio.create_task(_wait_for_close(websocket))
+        try:
+            while True:
+                next_event = asyncio.create_task(queue.get())
+                await asyncio.wait((next_event, closed), return_when=asyncio.FIRST_COMPLETED)
+                if closed.done():
+                    next_event.cancel()
+                    return
+                event = next_event.result()
+                await websocket.send_text(f'{{"event":"{event.name}","data":{event.data}}}')
+        except WebSocketDisconnect:
+            pass
+        finally:
+            closed.cancel()
+
+
+async def _wait_for_close(websocket: WebSocket) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics of this process (and of the bot in webhook mode)."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
+@router.get("/rates/today", response_model=CurrencyRatesResponse)
+async def get_today_rates(request: Request, session: AsyncSession = Depends(get_db_session)):
     today = date.today()
     controller = CurrencyController(session)
     rates = await controller.get_rates_by_date(today)
@@ -38,18 +318,78 @@ async def get_today_rates(session: AsyncSession = Depends(get_db_session)):
     if not rates:
         raise HTTPException(status_code=404, detail="Rates not found for today")
 
-    return {
-        "date": rates.date,
-        "ust_rub": rates.ust_rub_cents / 100,
-        "cny_rub": rates.cny_rub_fens / 100,
-        "ust_rub_plus1": rates.ust_rub_plus1_cents / 100,
-        "cny_rub_plus2p": rates.cny_rub_plus2p_fens / 100
-    }
+    return conditional_response(request, encode_rate(rates), cache_control_for(today))
+
+
+@router.post("/rates/as-of")
+async def get_rates_as_of(body: AsOfRequest, session: AsyncSession = Depends(get_db_session)):
+    """Rates in force on each of the given dates, in request order (null before the first known rate)."""
+    if len(body.dates) > MAX_AS_OF_DATES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_AS_OF_DATES} dates per request")
+
+    controller = CurrencyController(session)
+    resolved = await controller.get_rates_as_of_many(body.dates)
+    content = b"[" + b",".join(encode_rate_as_of(on, r) for on, r in zip(body.dates, resolved)) + b"]"
+    return Response(content, media_type="application/json")
 
 
-@app.get("/rates/{date_str}", response_model=CurrencyRatesResponse)
+def stream_conversions(results: Iterator, fmt: str) -> Iterator[bytes]:
+    # A plain generator: Starlette runs it in a thread, so the arithmetic doesn't block the event loop
+    if fmt == "json":
+        yield b"["
+    separator = b"\n" if fmt == "ndjson" else b","
+    chunk = []
+    first = True
+    for result in results:
+        chunk.append(encode_conversion(result))
+        if len(chunk) == CONVERSION_CHUNK_ITEMS:
+            yield _join_chunk(chunk, separator, fmt, first)
+            first = False
+            chunk = []
+    if chunk:
+        yield _join_chunk(chunk, separator, fmt, first)
+    if fmt == "json":
+        yield b"]"
+
+
+def _join_chunk(chunk: list[bytes], separator: bytes, fmt: str, first: bool) -> bytes:
+    if fmt == "ndjson":
+        return separator.join(chunk) + separator
+    return (b"" if first else separator) + separator.join(chunk)
+
+
+@router.post("/rates/convert")
+async def convert_amounts(
+    request: Request,
+    format: Literal["ndjson", "json"] = Query("ndjson"),
+    session: AsyncSession = Depends(get_db_session),
+):
+    """Convert many amounts to roubles at the as-of rates of their dates, results in request order.
+
+    The body is parsed here rather than by FastAPI so JSON numbers become
+    Decimals without passing through float.
+    """
+    try:
+        body = ConversionRequest.model_validate(json.loads(await request.body(), parse_float=Decimal))
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    if len(body.items) > MAX_CONVERSION_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_CONVERSION_ITEMS} items per request")
+
+    controller = CurrencyController(session)
+    await check_tiers(controller, {i.tier for i in body.items if i.tier is not None})
+    results = await controller.convert_many([(i.amount, i.currency, i.date, i.tier) for i in body.items])
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    return StreamingResponse(stream_conversions(results, format), media_type=media_type)
+
+
+@router.get("/rates/{date_str}", response_model=CurrencyRatesResponse)
 async def get_rates_by_date(
+    request: Request,
     date_str: str,
+    as_of: bool = Query(False, description="Fall back to the last earlier rates (weekends, holidays)"),
     session: AsyncSession = Depends(get_db_session)
 ):
     try:
@@ -58,71 +398,64 @@ async def get_rates_by_date(
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
     controller = CurrencyController(session)
-    rates = await controller.get_rates_by_date(target_date)
+    if as_of:
+        rates = await controller.get_rates_as_of(target_date)
+    else:
+        rates = await controller.get_rates_by_date(target_date)
 
     if not rates:
         raise HTTPException(status_code=404, detail="Rates not found for this date")
 
-    return {
-        "date": rates.date,
-        "ust_rub": rates.ust_rub_cents / 100,
-        "cny_rub": rates.cny_rub_fens / 100,
-        "ust_rub_plus1": rates.ust_rub_plus1_cents / 100,
-        "cny_rub_plus2p": rates.cny_rub_plus2p_fens / 100
-    }
+    return conditional_response(request, encode_rate(rates), cache_control_for(target_date))
 
 
-@app.get("/rates", response_model=List[CurrencyRatesResponse])
+@router.get("/rates", response_model=List[CurrencyRatesResponse])
 async def get_rates_range(
+    request: Request,
     from_date: Optional[date] = Query(None),
     to_date: Optional[date] = Query(None),
+    after: Optional[date] = Query(None, description="Return rates strictly after this date (cursor)"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fill: bool = Query(False, description="One entry per calendar day, carrying the last known rates forward"),
     session: AsyncSession = Depends(get_db_session)
 ):
     controller = CurrencyController(session)
-    result = await controller.get_rates_range(from_date, to_date)
+    if fill:
+        if not from_date or not to_date or after or limit:
+            raise HTTPException(status_code=400, detail="fill needs from_date and to_date and no paging")
+        if (to_date - from_date).days >= MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"fill covers at most {MAX_PAGE_SIZE} days")
+        filled = await controller.get_rates_filled(from_date, to_date)
+        body = b"[" + b",".join(encode_rate_as_of(day, r) for day, r in filled) + b"]"
+        return conditional_response(request, body, cache_control_for(to_date))
 
-    return [
-        {
-            "date": r.date,
-            "ust_rub": r.ust_rub_cents / 100,
-            "cny_rub": r.cny_rub_fens / 100,
-            "ust_rub_plus1": r.ust_rub_plus1_cents / 100,
-            "cny_rub_plus2p": r.cny_rub_plus2p_fens / 100
-        } for r in result
-    ]
+    result = await controller.get_rates_range(from_date, to_date, after=after, limit=limit)
 
+    response = conditional_response(request, encode_rates(result), cache_control_for(to_date))
 
-@app.get("/", response_class=HTMLResponse)
+    if limit and len(result) == limit:
+        response.headers["X-Next-Cursor"] = result[-1].date.isoformat()
+    return response
+
+
+@router.get("/", response_class=HTMLResponse)
 async def index(request: Request, session: AsyncSession = Depends(get_db_session)):
     today = date.today()
-    week_ago = today - timedelta(days=6)
-    controller = CurrencyController(session)
-    week_rates_models = await controller.get_rates_range(week_ago, today)
-    week_rates = [
-        {
-            "date": r.date,
-            "ust_rub": r.ust_rub_cents / 100,
-            "cny_rub": r.cny_rub_fens / 100,
-            "ust_rub_plus1": r.ust_rub_plus1_cents / 100,
-            "cny_rub_plus2p": r.cny_rub_plus2p_fens / 100,
-        }
-        for r in week_rates_models
-    ]
-
-    latest = await controller.get_latest_rate()
-    latest_data = None
-    if latest:
-        latest_data = {
-            "date": latest.date,
-            "ust_rub": latest.ust_rub_cents / 100,
-            "cny_rub": latest.cny_rub_fens / 100,
+    # Keyed by day, so the page is rebuilt after midnight as well as after every save
+    key = ("index", today)
+    page = page_cache.get(key)
+    if page is MISSING:
+        week_ago = today - timedelta(days=6)
+        controller = CurrencyController(session)
+        week_rates_models, latest = await controller.get_index_view(week_ago, today)
+
+        context = {
+            "default_rates": [rate_to_dict(r) for r in week_rates_models],
+            "latest_rate": rate_to_dict(latest) if latest else None,
+            "from_date": week_ago.isoformat(),
+            "to_date": today.isoformat(),
         }
+        page = RenderedPage(get_templates().get_template("index.html").render(context).encode())
+        page_cache.set(key, page)
 
-    context = {
-        "request": request,
-        "default_rates": week_rates,
-        "latest_rate": latest_data,
-        "from_date": week_ago.isoformat(),
-        "to_date": today.isoformat(),
-    }
-    return templates.TemplateResponse("index.html", context)
+    return page_response(request, page)
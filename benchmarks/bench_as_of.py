@@ -0,0 +1,47 @@
+"""Resolving invoice dates: one as-of lookup per date vs get_rates_as_of_many in a single query."""
+import asyncio
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from benchmarks.common import BENCH_DATABASE_URL, seed
+from cache import rates_cache
+from controllers import CurrencyController
+from database import make_engine
+
+YEARS = 10
+DATES = 10_000
+
+
+async def main():
+    engine = make_engine(BENCH_DATABASE_URL)
+    await seed(engine, YEARS * 365)
+    sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    rng = random.Random(0)
+    dates = [date(2010, 1, 1) + timedelta(days=rng.randrange(YEARS * 365)) for _ in range(DATES)]
+
+    results = {}
+    async with sessions() as session:
+        controller = CurrencyController(session)
+
+        rates_cache.invalidate()
+        started = time.perf_counter()
+        one_by_one = [await controller.get_rates_as_of(on) for on in dates]
+        results["per_date"] = {"dates": DATES, "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+        rates_cache.invalidate()
+        started = time.perf_counter()
+        bulk = await controller.get_rates_as_of_many(dates)
+        results["bulk"] = {"dates": DATES, "ms": round((time.perf_counter() - started) * 1000, 1)}
+        assert bulk == one_by_one
+
+    await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
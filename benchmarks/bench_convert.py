@@ -0,0 +1,61 @@
+"""Converting invoice lines: one POST /rates/convert per batch vs a /rates/{date} lookup per line."""
+import asyncio
+import json
+import random
+import time
+from datetime import date, timedelta
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import api
+import database
+from benchmarks.common import BENCH_DATABASE_URL, seed
+
+YEARS = 5
+ITEMS = 100_000
+PER_LINE_ITEMS = 2000
+
+
+def invoice_lines(count: int) -> list[dict]:
+    rng = random.Random(0)
+    return [
+        {
+            "amount": f"{rng.randrange(1, 10 ** 6)}.{rng.randrange(100):02d}",
+            "currency": rng.choice(("USD", "CNY")),
+            "date": (date(2010, 1, 1) + timedelta(days=rng.randrange(YEARS * 365))).isoformat(),
+        }
+        for _ in range(count)
+    ]
+
+
+async def main():
+    engine = database.make_engine(BENCH_DATABASE_URL)
+    await seed(engine, YEARS * 365)
+    database.async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    results = {}
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        lines = invoice_lines(ITEMS)
+        started = time.perf_counter()
+        response = await client.post("/rates/convert", json={"items": lines})
+        response.raise_for_status()
+        elapsed = time.perf_counter() - started
+        assert len(response.content.splitlines()) == ITEMS
+        results["bulk"] = {"items": ITEMS, "ms": round(elapsed * 1000), "items_per_s": round(ITEMS / elapsed)}
+
+        started = time.perf_counter()
+        for line in lines[:PER_LINE_ITEMS]:
+            response = await client.get(f"/rates/{line['date']}", params={"as_of": "true"})
+            response.raise_for_status()
+        elapsed = time.perf_counter() - started
+        results["per_line"] = {"items": PER_LINE_ITEMS, "ms": round(elapsed * 1000),
+                               "items_per_s": round(PER_LINE_ITEMS / elapsed)}
+
+    await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+"""Requests per second for `/` with the rendered page cached vs rebuilt on every hit."""
+import asyncio
+import json
+import time
+
+import httpx
+
+import api
+import database
+from benchmarks.common import BENCH_DATABASE_URL, seed
+from cache import invalidate_rates
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+REQUESTS = 2000
+
+
+async def run(client: httpx.AsyncClient, cached: bool) -> dict:
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        if not cached:
+            invalidate_rates()
+        response = await client.get("/", headers={"Accept-Encoding": "gzip"})
+        response.raise_for_status()
+    elapsed = time.perf_counter() - started
+    return {"requests": REQUESTS, "rps": round(REQUESTS / elapsed)}
+
+
+async def main():
+    engine = database.make_engine(BENCH_DATABASE_URL)
+    await seed(engine, 20 * 365)
+    database.async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {"uncached": await run(client, cached=False), "cached": await run(client, cached=True)}
+
+    await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
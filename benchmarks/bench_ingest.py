@@ -0,0 +1,58 @@
+"""Loading 100k days of rates: add_rates per row vs add_rates_many batches."""
+import asyncio
+import json
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from benchmarks.common import BENCH_DATABASE_URL, seed
+from controllers import CurrencyController
+from database import make_engine
+from models import CurrencyRates
+
+ROWS = 100_000
+SINGLE_ROWS = 1_000
+
+
+def history(count: int) -> list[tuple[date, Decimal, Decimal]]:
+    start = date(1800, 1, 1)
+    return [
+        (start + timedelta(days=i), Decimal(f"{70 + i % 30}.15"), Decimal(f"{10 + i % 4}.85"))
+        for i in range(count)
+    ]
+
+
+async def main():
+    engine = make_engine(BENCH_DATABASE_URL)
+    await seed(engine, 0)
+    sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    results = {}
+
+    rows = history(SINGLE_ROWS)
+    started = time.perf_counter()
+    async with sessions() as session:
+        controller = CurrencyController(session)
+        for rate_date, ust, cny in rows:
+            await controller.add_rates(ust, cny, rate_date)
+    elapsed = time.perf_counter() - started
+    results["add_rates"] = {"rows": SINGLE_ROWS, "rows_per_s": round(SINGLE_ROWS / elapsed)}
+
+    for batch_size in (1000, 5000):
+        async with engine.begin() as conn:
+            await conn.execute(delete(CurrencyRates))
+        rows = history(ROWS)
+        started = time.perf_counter()
+        async with sessions() as session:
+            await CurrencyController(session).add_rates_many(rows, batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+        results[f"add_rates_many_{batch_size}"] = {"rows": ROWS, "rows_per_s": round(ROWS / elapsed)}
+
+    await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""Cost of instrumentation: the API with and without MetricsMiddleware and query timing."""
+import os
+
+# Build the app uninstrumented, the instrumented variant is assembled below
+os.environ["METRICS_ENABLED"] = "false"
+
+import asyncio
+import json
+import time
+import timeit
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import api
+import database
+from benchmarks.common import BENCH_DATABASE_URL, seed
+from cache import invalidate_rates
+from metrics import MetricsMiddleware, instrument_engine, http_request_duration
+
+REQUESTS = 2000
+ROUNDS = 3
+PATHS = {"cached": "/rates/2015-06-01", "uncached": "/rates?limit=100"}
+
+
+async def run(app, path: str, cached: bool) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        for _ in range(REQUESTS):
+            if not cached:
+                invalidate_rates()
+            response = await client.get(path)
+            response.raise_for_status()
+        return (time.perf_counter() - started) / REQUESTS * 1e6
+
+
+async def main():
+    engine = database.make_engine(BENCH_DATABASE_URL)
+    await seed(engine, 10 * 365)
+    database.async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    # Event listeners can't be removed per request, so time the plain path first; best of ROUNDS each
+    plain = {name: min([await run(api.app, path, name == "cached") for _ in range(ROUNDS)])
+             for name, path in PATHS.items()}
+    instrument_engine(engine)
+    instrumented_app = MetricsMiddleware(api.app)
+    instrumented = {name: min([await run(instrumented_app, path, name == "cached") for _ in range(ROUNDS)])
+                    for name, path in PATHS.items()}
+
+    results = {
+        name: {
+            "plain_us_per_request": round(plain[name], 1),
+            "instrumented_us_per_request": round(instrumented[name], 1),
+            "overhead_us": round(instrumented[name] - plain[name], 1),
+        }
+        for name in PATHS
+    }
+    number = 200_000
+    observe = timeit.timeit(lambda: http_request_duration.observe(0.003, "GET", "bench", 200), number=number)
+    results["histogram_observe_ns"] = round(observe / number * 1e9)
+
+    await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,41 @@
+"""Exactness and cost of the minor-unit pipeline.
+
+Checks over RANDOM_INPUTS random values that money.format_minor writes the same
+bytes as the float path it replaced (repr(minor / 100)), and that to_minor
+never truncates decimal inputs the way int(float(x) * 100) did.
+"""
+import json
+import os
+import random
+import timeit
+from decimal import Decimal
+
+from money import MINOR_UNITS, to_minor, format_minor
+
+RANDOM_INPUTS = int(os.getenv("RANDOM_INPUTS", "1000000"))
+
+
+def main():
+    rng = random.Random(42)
+    minors = [rng.randrange(0, 10 ** rng.randrange(1, 12)) for _ in range(RANDOM_INPUTS)]
+    mismatches = sum(format_minor(m) != repr(m / MINOR_UNITS) for m in minors)
+
+    truncated = 0
+    for m in minors:
+        text = format_minor(m)
+        assert to_minor(Decimal(text)) == m
+        truncated += int(float(text) * MINOR_UNITS) != m
+
+    sample = minors[:10_000]
+    results = {
+        "inputs": RANDOM_INPUTS,
+        "format_mismatches": mismatches,
+        "float_pipeline_truncations": truncated,
+        "float_repr_ns": round(min(timeit.repeat(lambda: [repr(m / MINOR_UNITS) for m in sample], number=20, repeat=5)) / (20 * len(sample)) * 1e9, 1),
+        "format_minor_ns": round(min(timeit.repeat(lambda: [format_minor(m) for m in sample], number=20, repeat=5)) / (20 * len(sample)) * 1e9, 1),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
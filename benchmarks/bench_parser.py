@@ -0,0 +1,56 @@
+"""Operator message parsing throughput: the old split/isdigit parser vs rate_parser."""
+import json
+import timeit
+from decimal import Decimal
+
+from rate_parser import parse_rates
+
+MESSAGES = [
+    "93.15 12.85",
+    "93,15\n12,85",
+    "USD 93,15 CNY 12,85",
+    "usd: 93.15, cny: 12.85",
+    "93.15 долл 12,85 юаня",
+    "$93.15 ¥12.85",
+    "Курсы на сегодня: USDT 93.15₽, CNY 12.85₽",
+]
+REFERENCE = {"USD": Decimal("93"), "CNY": Decimal("12.8")}
+
+
+def legacy_parse(text: str):
+    parts = [Decimal(p) for p in text.replace(",", ".").replace("\n", " ").split() if p.replace('.', '', 1).isdigit()]
+    if len(parts) != 2:
+        raise ValueError(text)
+    return max(parts), min(parts)
+
+
+def parse_or_none(parse, text):
+    try:
+        return parse(text)
+    except ValueError:
+        return None
+
+
+def accepted(parse) -> int:
+    return sum(parse_or_none(parse, text) is not None for text in MESSAGES)
+
+
+def main():
+    results = {}
+    for name, parse in (
+        ("legacy", legacy_parse),
+        ("rate_parser", parse_rates),
+        ("rate_parser_with_reference", lambda text: parse_rates(text, reference=REFERENCE)),
+    ):
+        number = 2000
+        elapsed = min(timeit.repeat(lambda: [parse_or_none(parse, m) for m in MESSAGES], number=number, repeat=5))
+        results[name] = {
+            "accepted": f"{accepted(parse)}/{len(MESSAGES)}",
+            "messages_per_s": round(number * len(MESSAGES) / elapsed),
+            "us_per_message": round(elapsed / (number * len(MESSAGES)) * 1e6, 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Per-request latency of a rate lookup with NullPool vs the pooled engine."""
+import asyncio
+import json
+from datetime import date
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from benchmarks.common import BENCH_DATABASE_URL, seed, measure
+from cache import rates_cache
+from controllers import CurrencyController
+from database import make_engine
+
+ITERATIONS = 500
+
+
+async def run(pool_mode: str) -> dict:
+    engine = make_engine(BENCH_DATABASE_URL, pool_mode=pool_mode)
+    sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def one_request():
+        # Every lookup goes to the database; a cache hit never touches the pool
+        rates_cache.invalidate()
+        async with sessions() as session:
+            await CurrencyController(session).get_rates_by_date(date(2010, 6, 1))
+
+    try:
+        return await measure(one_request, ITERATIONS)
+    finally:
+        await engine.dispose()
+
+
+async def main():
+    seed_engine = make_engine(BENCH_DATABASE_URL, pool_mode="null")
+    await seed(seed_engine, 365)
+    await seed_engine.dispose()
+
+    results = {mode: await run(mode) for mode in ("null", "queue")}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
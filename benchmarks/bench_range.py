@@ -0,0 +1,72 @@
+"""Full /rates materialisation vs keyset pages vs streaming over multi-year history."""
+import asyncio
+import json
+import time
+import tracemalloc
+from datetime import date
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import api
+import database
+from benchmarks.common import BENCH_DATABASE_URL, seed
+from cache import rates_cache
+
+YEARS = 20
+PAGE_SIZE = 1000
+
+
+async def profile(fn) -> dict:
+    rates_cache.invalidate()
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = await fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": round(elapsed * 1000, 1), "peak_kib": peak // 1024, "bytes": size}
+
+
+async def main():
+    engine = database.make_engine(BENCH_DATABASE_URL)
+    await seed(engine, YEARS * 365)
+    sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    # stream_rates opens its own sessions through database.get_session
+    database.async_session = sessions
+
+    request = api.Request({"type": "http", "headers": []})
+
+    async def full():
+        async with sessions() as session:
+            response = await api.get_rates_range(request, None, None, None, None, session)
+            return len(response.body)
+
+    async def pages():
+        total, after = 0, None
+        while True:
+            async with sessions() as session:
+                response = await api.get_rates_range(request, None, None, after, PAGE_SIZE, session)
+            total += len(response.body)
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                return total
+            after = date.fromisoformat(cursor)
+
+    async def stream():
+        total = 0
+        async for chunk in api.stream_rates(None, None, "ndjson"):
+            total += len(chunk)
+        return total
+
+    results = {
+        "rows": YEARS * 365,
+        "full": await profile(full),
+        "keyset_pages": await profile(pages),
+        "stream_ndjson": await profile(stream),
+    }
+    await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+"""Per-row serialization cost: dicts + Pydantic validation vs serializers.encode_rates."""
+import json
+import timeit
+from collections import namedtuple
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from api import CurrencyRatesResponse
+from benchmarks.common import rate_rows
+from serializers import rate_to_dict, encode_rates
+
+Rate = namedtuple("Rate", "date ust_rub_cents cny_rub_fens ust_rub_plus1_cents cny_rub_plus2p_fens")
+adapter = TypeAdapter(List[CurrencyRatesResponse])
+
+
+def pydantic_path(rows) -> bytes:
+    validated = adapter.validate_python([rate_to_dict(r) for r in rows])
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def fast_path(rows) -> bytes:
+    return encode_rates(rows)
+
+
+def main():
+    results = {}
+    for size in (1, 7, 10_000):
+        rows = [Rate(**r) for r in rate_rows(size)]
+        assert pydantic_path(rows) == fast_path(rows)
+        number = max(1, 20_000 // size)
+        results[size] = {
+            name: round(min(timeit.repeat(lambda: fn(rows), number=number, repeat=5)) / (number * size) * 1e6, 3)
+            for name, fn in (("pydantic_us_per_row", pydantic_path), ("fast_us_per_row", fast_path))
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
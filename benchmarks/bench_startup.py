@@ -0,0 +1,134 @@
+"""Import cost and time to first response of the API and bot processes.
+
+Each measurement runs in a fresh interpreter without the bot's environment
+variables, so it also checks that importing has no side effects: no env
+needed, .env not read, no threads started, no engine, no app built. `python -X importtime` attributes the import
+time to the heaviest top-level dependencies. With --max-import-ms the script
+exits with status 1 when a module takes longer to import:
+
+    python -m benchmarks.bench_startup --max-import-ms 1500
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BENCH_DATABASE_URL, seed
+from database import make_engine
+
+MODULES = ("api", "bot", "controllers")
+TOP_IMPORTS = 5
+
+SIDE_EFFECTS_CHECK = """
+import threading
+import dotenv
+dotenv_loads = []
+dotenv.load_dotenv = lambda *args, **kwargs: dotenv_loads.append(args)
+
+import api, bot, database
+assert not dotenv_loads, "importing read .env"
+assert threading.active_count() == 1, "importing started threads: " + str(threading.enumerate())
+assert database._engine is None, "importing created the database engine"
+assert api._app is None, "importing built the FastAPI app"
+assert bot.get_bot.cache_info().currsize == 0, "importing created the Bot"
+"""
+
+FIRST_RESPONSE = """
+import asyncio, time
+started = time.perf_counter()
+import api, httpx
+imported = time.perf_counter()
+
+async def main():
+    app = api.create_app()
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.get("/rates/today")
+        done = time.perf_counter()
+    print(f"{(imported - started) * 1000:.1f} {(ready - imported) * 1000:.1f} {(done - ready) * 1000:.1f}")
+
+asyncio.run(main())
+"""
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def clean_env(**extra) -> dict:
+    env = {k: v for k, v in os.environ.items() if k not in ("BOT_TOKEN", "TARGET_USER_ID", "MANAGER_CHAT_ID")}
+    env.update(extra)
+    return env
+
+
+def import_profile(module: str) -> dict:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, env=clean_env())
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    total = 0
+    top = []
+    for match in _IMPORT_LINE.finditer(result.stderr):
+        cumulative_us, depth, name = int(match[2]), len(match[3]), match[4]
+        if name == module:
+            total = cumulative_us
+        elif depth == 3:
+            top.append((cumulative_us, name))
+    top.sort(reverse=True)
+    return {
+        "import_ms": round(total / 1000, 1),
+        "heaviest": {name: round(us / 1000, 1) for us, name in top[:TOP_IMPORTS]},
+    }
+
+
+def first_response() -> dict:
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", FIRST_RESPONSE], capture_output=True, text=True,
+                            env=clean_env(DATABASE_URL=BENCH_DATABASE_URL, LOG_OUTPUTS="none"))
+    total = time.perf_counter() - started
+    if result.returncode:
+        raise RuntimeError(f"startup failed:\n{result.stderr[-2000:]}")
+    import_ms, startup_ms, request_ms = map(float, result.stdout.split()[-3:])
+    return {
+        "process_ms": round(total * 1000, 1),
+        "import_ms": import_ms,
+        "lifespan_startup_ms": startup_ms,
+        "first_request_ms": request_ms,
+    }
+
+
+async def seed_database() -> None:
+    engine = make_engine(BENCH_DATABASE_URL)
+    await seed(engine, 365)
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and startup time")
+    parser.add_argument("--max-import-ms", type=float, help="fail when a module imports slower than this")
+    args = parser.parse_args()
+    asyncio.run(seed_database())
+
+    # Every log output on, so setting up loggers would show if it started the Telegram thread
+    side_effects = subprocess.run([sys.executable, "-c", SIDE_EFFECTS_CHECK], capture_output=True, text=True,
+                                  env=clean_env(LOG_OUTPUTS="console,telegram", TELEGRAM_LOG_TOKEN="42:bench",
+                                                TELEGRAM_LOG_CHAT_ID="1"))
+    results = {
+        "import_side_effects": "none" if side_effects.returncode == 0 else side_effects.stderr.strip().splitlines()[-1],
+        "imports": {module: import_profile(module) for module in MODULES},
+        "api_first_response": first_response(),
+    }
+    print(json.dumps(results, indent=2))
+
+    slow = [m for m, r in results["imports"].items() if args.max_import_ms and r["import_ms"] > args.max_import_ms]
+    if side_effects.returncode or slow:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Throughput of the rate endpoints with 1..N uvicorn workers, and stale reads after a write.
+
+Each run starts `uvicorn api:app --workers N` against BENCH_DATABASE_URL and
+loads it from --clients processes for --seconds. Afterwards the script saves
+new rates for today the way the bot does and reads /rates/today again through
+fresh connections, counting responses that still carry the old rate. With the
+shared cache version every worker drops its cached copy on the next lookup; run
+with --no-shared-version to see workers serve stale rates until the TTL expires:
+
+    python -m benchmarks.bench_workers --workers 1 2 4
+"""
+import os
+import tempfile
+
+# Shared by this process (the writer) and the workers it starts
+VERSION_FILE = os.path.join(tempfile.gettempdir(), "wave_rates_bench_workers.version")
+os.environ["CACHE_VERSION_FILE"] = VERSION_FILE
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from benchmarks.common import BENCH_DATABASE_URL, seed, percentile
+from controllers import CurrencyController
+from database import make_engine
+
+DAYS = 365
+PORT = 8765
+BASE_URL = f"http://127.0.0.1:{PORT}"
+STALENESS_READS = 200
+
+
+def request_paths(rng: random.Random):
+    today = date.today()
+    while True:
+        yield "/rates/today"
+        yield f"/rates/{today - timedelta(days=rng.randrange(DAYS))}"
+        yield "/rates?limit=100"
+
+
+async def load(seconds: float, concurrency: int, seed_value: int) -> list[float]:
+    paths = request_paths(random.Random(seed_value))
+    timings = []
+    deadline = time.perf_counter() + seconds
+
+    async def worker(client: httpx.AsyncClient):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get(next(paths))
+            response.raise_for_status()
+            timings.append((time.perf_counter() - started) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return timings
+
+
+def run_client(seconds: float, concurrency: int, seed_value: int) -> list[float]:
+    return asyncio.run(load(seconds, concurrency, seed_value))
+
+
+def start_server(workers: int, shared: bool) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=BENCH_DATABASE_URL, LOG_OUTPUTS="none",
+               CACHE_VERSION_FILE=VERSION_FILE if shared else "none")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(PORT), "--workers", str(workers),
+         "--log-level", "warning"],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            # One answer doesn't mean every worker is up; give the rest a moment
+            httpx.get(f"{BASE_URL}/rates/today").raise_for_status()
+            time.sleep(1 + workers * 0.5)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+
+async def stale_reads(sessions: async_sessionmaker) -> int:
+    """Save new rates for today, then count fresh-connection reads still returning the old ones."""
+    async with httpx.AsyncClient(base_url=BASE_URL) as client:
+        before = (await client.get("/rates/today")).json()
+    ust = Decimal(str(before["ust_rub"])) + Decimal("0.01")
+    async with sessions() as session:
+        await CurrencyController(session).add_rates(ust, Decimal(str(before["cny_rub"])), date.today())
+
+    stale = 0
+    for _ in range(STALENESS_READS):
+        # A new connection each time, so reads spread over the workers
+        async with httpx.AsyncClient(base_url=BASE_URL) as client:
+            if (await client.get("/rates/today")).json()["ust_rub"] == before["ust_rub"]:
+                stale += 1
+    return stale
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Scale the API over uvicorn workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per client")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--no-shared-version", action="store_true", help="keep cache invalidation per worker")
+    args = parser.parse_args()
+
+    engine = make_engine(BENCH_DATABASE_URL)
+    await seed(engine, DAYS, start=date.today() - timedelta(days=DAYS - 1))
+    sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    results = {"cpus": os.cpu_count(), "shared_version": not args.no_shared_version, "runs": {}}
+    loop = asyncio.get_running_loop()
+    try:
+        for workers in args.workers:
+            server = start_server(workers, shared=not args.no_shared_version)
+            try:
+                with ProcessPoolExecutor(args.clients) as pool:
+                    started = time.perf_counter()
+                    parts = await asyncio.gather(*(
+                        loop.run_in_executor(pool, run_client, args.seconds, args.concurrency, i)
+                        for i in range(args.clients)
+                    ))
+                    elapsed = time.perf_counter() - started
+                timings = sorted(t for part in parts for t in part)
+                results["runs"][workers] = {
+                    "requests": len(timings),
+                    "throughput_per_s": round(len(timings) / elapsed, 1),
+                    "p50_ms": round(percentile(timings, 0.50), 3),
+                    "p99_ms": round(percentile(timings, 0.99), 3),
+                    "stale_reads_after_write": f"{await stale_reads(sessions)}/{STALENESS_READS}",
+                }
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        await engine.dispose()
+
+    base = results["runs"].get(args.workers[0])
+    for run in results["runs"].values():
+        run["speedup"] = round(run["throughput_per_s"] / base["throughput_per_s"], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
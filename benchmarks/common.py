@@ -0,0 +1,76 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run against BENCH_DATABASE_URL (a local SQLite file via aiosqlite
+by default, or any Postgres instance) and are started from the repo root:
+
+    python -m benchmarks.bench_pool
+"""
+import asyncio
+import math
+import os
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Callable, Awaitable
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from models import Base, CurrencyRates
+
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL", "sqlite+aiosqlite:///./bench.sqlite3")
+
+
+def rate_rows(days: int, start: date = date(2010, 1, 1)) -> list[dict]:
+    rows = []
+    for i in range(days):
+        ust_cents = 7000 + i % 3000
+        cny_fens = 1000 + i % 400
+        rows.append({
+            "date": start + timedelta(days=i),
+            "ust_rub_cents": ust_cents,
+            "cny_rub_fens": cny_fens,
+            "ust_rub_plus1_cents": ust_cents + 100,
+            "cny_rub_plus2p_fens": int(cny_fens * 1.02),
+        })
+    return rows
+
+
+async def seed(engine: AsyncEngine, days: int, start: date = date(2010, 1, 1)) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(delete(CurrencyRates))
+        rows = rate_rows(days, start)
+        for i in range(0, len(rows), 1000):
+            await conn.execute(insert(CurrencyRates), rows[i:i + 1000])
+
+
+def percentile(sorted_timings: list[float], q: float) -> float:
+    return sorted_timings[max(0, math.ceil(len(sorted_timings) * q) - 1)]
+
+
+async def measure(fn: Callable[[], Awaitable], iterations: int, concurrency: int = 1) -> dict:
+    """Run `fn` `iterations` times from `concurrency` workers and summarise latency and throughput."""
+    timings = []
+    remaining = iter(range(iterations))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            await fn()
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "throughput_per_s": round(iterations / elapsed, 1),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+    }
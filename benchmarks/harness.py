@@ -0,0 +1,226 @@
+"""Latency and throughput of the API routes and the bot's message handler.
+
+Seeds BENCH_DATABASE_URL with `--days` of history ending today, drives the
+FastAPI app in-process over ASGI and feeds synthetic updates to the aiogram
+dispatcher, whose Bot API calls are answered locally. Prints (or writes with
+--output) one JSON report per run; pass --compare with an earlier report to
+see the change per scenario:
+
+    python -m benchmarks.harness --days 3650 --output before.json
+    python -m benchmarks.harness --days 3650 --compare before.json
+"""
+import os
+
+# Read by bot.get_settings(); the harness never talks to Telegram
+os.environ.setdefault("BOT_TOKEN", "42:bench")
+os.environ.setdefault("TARGET_USER_ID", "1")
+os.environ.setdefault("MANAGER_CHAT_ID", "2")
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import subprocess
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage
+from aiogram.types import Update
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import api
+import bot
+import database
+from benchmarks.common import BENCH_DATABASE_URL, rate_rows, seed, measure
+from cache import invalidate_rates
+from controllers import MANUAL_SOURCE, RateRequestsController
+from models import RateObservations
+from money import from_minor
+
+API_SCENARIOS = ("rates_today", "rates_by_date", "rates_year", "rates_page", "index")
+BOT_SCENARIOS = ("bot_rates_message", "bot_ignored_message")
+
+
+class OfflineSession(BaseSession):
+    """Answers Bot API calls locally after `latency` seconds, as a stand-in for Telegram."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot, method, timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        result = True
+        if isinstance(method, SendMessage):
+            result = {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": method.chat_id, "type": "private"},
+                "text": method.text,
+            }
+        response = self.check_response(bot, method, 200, json.dumps({"ok": True, "result": result}))
+        return response.result
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+def api_requests(days: int, cold: bool):
+    today = date.today()
+    rng = random.Random(0)
+    paths = {
+        "rates_today": lambda: "/rates/today",
+        "rates_by_date": lambda: f"/rates/{today - timedelta(days=rng.randrange(days))}",
+        "rates_year": lambda: f"/rates?from_date={today - timedelta(days=365)}&to_date={today}",
+        "rates_page": lambda: "/rates?limit=100",
+        "index": lambda: "/",
+    }
+
+    def scenario(client: httpx.AsyncClient, name: str):
+        async def request():
+            if cold:
+                invalidate_rates()
+            response = await client.get(paths[name]())
+            response.raise_for_status()
+        return request
+
+    return scenario
+
+
+def bot_updates(latest: dict):
+    """Handlers fed with messages near the `latest` seeded rates, so none is held back as an outlier."""
+    update_ids = itertools.count(1)
+    user_id = bot.get_settings().target_user_id
+
+    def update(from_id: int, text: str) -> Update:
+        return Update.model_validate({
+            "update_id": next(update_ids),
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": from_id, "type": "private"},
+                "from": {"id": from_id, "is_bot": False, "first_name": "Bench"},
+                "text": text,
+            },
+        })
+
+    def near(minor: int) -> str:
+        return str(from_minor(minor + random.randrange(-50, 51))).replace(".", ",")
+
+    async def rates_message():
+        text = f"USD {near(latest['ust_rub_plus1_cents'])} CNY {near(latest['cny_rub_plus2p_fens'])}"
+        await bot.dp.feed_update(bot.get_bot(), update(user_id, text))
+
+    async def ignored_message():
+        await bot.dp.feed_update(bot.get_bot(), update(user_id + 1, "93.15 12.85"))
+
+    return {"bot_rates_message": rates_message, "bot_ignored_message": ignored_message}
+
+
+async def manual_observations() -> int:
+    async with database.get_session() as session:
+        return await session.scalar(select(func.count()).select_from(RateObservations)
+                                    .where(RateObservations.source == MANUAL_SOURCE))
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    changes = {}
+    for name, result in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        changes[name] = {
+            key: f"{(result[key] / before[key] - 1) * 100:+.1f}%"
+            for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s")
+            if before.get(key)
+        }
+    return changes
+
+
+async def run(args) -> dict:
+    engine = database.make_engine(BENCH_DATABASE_URL)
+    try:
+        start = date.today() - timedelta(days=args.days - 1)
+        await seed(engine, args.days, start=start)
+        database.async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        # The handler only accepts rates after the day's prompt was sent
+        async with database.get_session() as session:
+            await RateRequestsController(session).mark_requested(bot.today())
+
+        results = {}
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for cold in (False, True):
+                scenario = api_requests(args.days, cold)
+                for name in API_SCENARIOS:
+                    if name in args.scenarios:
+                        label = f"{name}_{'cold' if cold else 'warm'}"
+                        results[label] = await measure(scenario(client, name), args.requests, args.concurrency)
+
+        bot.get_bot().session = OfflineSession(args.telegram_latency / 1000)
+        latest = rate_rows(args.days, start)[-1]
+        saved_before = await manual_observations()
+        for name, fn in bot_updates(latest).items():
+            if name in args.scenarios:
+                results[name] = await measure(fn, args.requests, args.concurrency)
+        if "bot_rates_message" in args.scenarios and await manual_observations() == saved_before:
+            raise RuntimeError("bot_rates_message saved no rates, the handler rejected its messages")
+        # Announcements are paced by the rate limiter and would outlast the run
+        for task in list(bot.background_tasks):
+            task.cancel()
+        await asyncio.gather(*bot.background_tasks, return_exceptions=True)
+    finally:
+        await engine.dispose()
+
+    return {
+        "revision": git_revision(),
+        "database": engine.dialect.name,
+        "days": args.days,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API routes and bot handlers")
+    parser.add_argument("--days", type=int, default=5 * 365, help="history size to seed")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--telegram-latency", type=float, default=0, help="simulated Bot API latency, ms")
+    parser.add_argument("--scenarios", nargs="+", choices=API_SCENARIOS + BOT_SCENARIOS,
+                        default=API_SCENARIOS + BOT_SCENARIOS)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path, help="earlier report to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.compare:
+        report["change"] = compare(report, json.loads(args.compare.read_text()))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,131 +1,293 @@
+if __name__ == "__main__":
+    # Run as a script: read .env before the modules below read their settings
+    from dotenv import load_dotenv
+    load_dotenv()
+
 import os
 import asyncio
-from datetime import date
-from decimal import Decimal
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import cache
+from zoneinfo import ZoneInfo
 from aiogram import Bot, Dispatcher, F
+from aiogram.filters import Command
 from aiogram.types import Message
 from aiogram.enums import ParseMode, ChatType
 from aiogram.client.default import DefaultBotProperties
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from dotenv import load_dotenv
 
-from database import get_session
-from controllers import CurrencyController
+from database import get_engine, get_session, warm_up_pool, dispose_engine
+from controllers import CurrencyController, AnnouncementController, RateRequestsController
+from announcer import Announcer
+from leader import LeaderElection
 from logger import setup_logger
+from rate_parser import parse_rates, RateParseError
+from money import from_minor, to_minor
+from metrics import METRICS_ENABLED, METRICS_PORT, bot_handler_duration, telegram_request_duration, serve_metrics
 
-load_dotenv()
 logger = setup_logger(__name__, level="INFO")
 
-bot = Bot(
-    token=os.getenv("BOT_TOKEN"),
-    default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-)
+BOT_TIMEZONE = ZoneInfo(os.getenv("BOT_TIMEZONE", "Europe/Moscow"))
+# Messages starting with this confirm rates that look like outliers
+CONFIRM_PREFIX = "!"
+
 dp = Dispatcher()
-scheduler = AsyncIOScheduler()
+# Strong references so running broadcasts aren't garbage collected
+background_tasks: set[asyncio.Task] = set()
+
+
+@dataclass(frozen=True)
+class Settings:
+    token: str
+    target_user_id: int
+    manager_chat_id: int
+
+
+# Everything below is built on first use, so importing this module needs no environment
+@cache
+def get_settings() -> Settings:
+    missing = [name for name in ("BOT_TOKEN", "TARGET_USER_ID", "MANAGER_CHAT_ID") if not os.getenv(name)]
+    if missing:
+        raise RuntimeError(f"Missing environment variables: {', '.join(missing)}")
+    return Settings(
+        token=os.environ["BOT_TOKEN"],
+        target_user_id=int(os.environ["TARGET_USER_ID"]),
+        manager_chat_id=int(os.environ["MANAGER_CHAT_ID"]),
+    )
+
+
+@cache
+def get_bot() -> Bot:
+    bot = Bot(
+        token=get_settings().token,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+    if METRICS_ENABLED:
+        bot.session.middleware(time_telegram_request)
+    return bot
+
+
+@cache
+def get_scheduler() -> AsyncIOScheduler:
+    return AsyncIOScheduler(timezone=BOT_TIMEZONE)
+
+
+@cache
+def get_leader() -> LeaderElection:
+    # Only the leading replica runs the scheduled prompts; replicas need webhook
+    # mode, as Telegram serves long polling to one client per token
+    return LeaderElection(get_engine())
+
+
+@cache
+def get_announcer() -> Announcer:
+    return Announcer(get_bot())
 
-TARGET_USER_ID = int(os.getenv("TARGET_USER_ID"))
-MANAGER_CHAT_ID = int(os.getenv("MANAGER_CHAT_ID"))
 
-rate_cache = {"requested": False}
+def today() -> date:
+    return datetime.now(BOT_TIMEZONE).date()
+
+# --- Metrics ---
+
+async def time_handler(handler, event, data):
+    started = time.perf_counter()
+    try:
+        return await handler(event, data)
+    finally:
+        bot_handler_duration.observe(time.perf_counter() - started, data["handler"].callback.__name__)
+
+async def time_telegram_request(make_request, bot, method):
+    started = time.perf_counter()
+    status = "error"
+    try:
+        response = await make_request(bot, method)
+        status = "ok"
+        return response
+    finally:
+        telegram_request_duration.observe(time.perf_counter() - started, type(method).__name__, status)
+
+if METRICS_ENABLED:
+    dp.message.middleware(time_handler)
 
 # --- Tasks ---
 
-async def request_currency_inputs():
+async def send_rate_prompt():
     try:
-        await bot.send_message(TARGET_USER_ID,
+        await get_bot().send_message(get_settings().target_user_id,
             "📥 Введите курс валют (USD и CNY) в две строки, с учётом вашей наценки:\n\n"
             "Пример:\n<code>93.15\n12.85</code>")
-        rate_cache["requested"] = True
         logger.info("📩 Запрошены курсы у пользователя")
     except Exception as e:
         logger.error(f"❌ Ошибка при отправке сообщения: {e}")
 
+async def request_currency_inputs():
+    if not get_leader().is_leader:
+        return
+    async with get_session() as session:
+        # Another replica may already have asked today
+        if not await RateRequestsController(session).mark_requested(today()):
+            return
+    await send_rate_prompt()
+
 async def check_repeat_request():
+    if not get_leader().is_leader:
+        return
     async with get_session() as session:
-        controller = CurrencyController(session)
-        rates = await controller.get_rates_by_date(date.today())
+        rates = await CurrencyController(session).get_rates_by_date(today())
+        if rates is not None:
+            return
+        if not await RateRequestsController(session).mark_reminded(today()):
+            return
 
-    if rates is None:
-        logger.info("🔁 Повторный запрос курсов в 12:00")
-        await request_currency_inputs()
+    logger.info("🔁 Повторный запрос курсов в 12:00")
+    await send_rate_prompt()
+
+async def announce_rates(rate_date: date, text: str):
+    try:
+        async with get_session() as session:
+            chat_ids = [get_settings().manager_chat_id, *await AnnouncementController(session).get_active_chat_ids()]
+
+        # The broadcast is paced over seconds or minutes, so it must not hold a connection
+        deliveries = await get_announcer().broadcast(chat_ids, text)
+
+        async with get_session() as session:
+            controller = AnnouncementController(session)
+            await controller.record_deliveries(rate_date, deliveries)
+            forbidden = [d.chat_id for d in deliveries if d.status == "forbidden"]
+            if forbidden:
+                await controller.unsubscribe(forbidden)
+    except Exception as e:
+        logger.error(f"❌ Ошибка рассылки курсов: {e}")
+        return
+
+    failed = sum(d.status != "sent" for d in deliveries)
+    logger.info(f"📣 Курсы разосланы в {len(deliveries) - failed} из {len(deliveries)} чатов")
 
 # --- Handlers ---
 
+@dp.message(Command("subscribe"))
+async def handle_subscribe(message: Message):
+    if message.from_user is None or message.from_user.id != get_settings().target_user_id:
+        return
+    async with get_session() as session:
+        await AnnouncementController(session).subscribe(message.chat.id, message.chat.title)
+    await message.reply("✅ Этот чат будет получать курсы.")
+
+@dp.message(Command("unsubscribe"))
+async def handle_unsubscribe(message: Message):
+    if message.from_user is None or message.from_user.id != get_settings().target_user_id:
+        return
+    async with get_session() as session:
+        await AnnouncementController(session).unsubscribe([message.chat.id])
+    await message.reply("✅ Рассылка курсов в этот чат отключена.")
+
+
 @dp.message(F.text)
 async def handle_currency_message(message: Message):
     if (
-        message.from_user.id != TARGET_USER_ID
+        message.from_user.id != get_settings().target_user_id
         or message.chat.type != ChatType.PRIVATE
     ):
         return
 
     async with get_session() as session:
         controller = CurrencyController(session)
-        has_today = await controller.has_rates_for_date(date.today())
+        has_today = await controller.has_rates_for_date(today())
 
-        if not rate_cache.get("requested") and not has_today:
+        if not has_today and not await RateRequestsController(session).was_requested(today()):
             return
 
         try:
-            # Извлекаем числа из текста
-            raw_text = message.text.replace(",", ".")
-            parts = [Decimal(p) for p in raw_text.replace("\n", " ").split() if p.replace('.', '', 1).isdigit()]
-
-            if len(parts) != 2:
-                await message.reply("❌ Неверный формат. Введите два курса — например:\n<code>93.15 12.85</code>")
-                return
-
-            usd_markup, cny_markup = max(parts), min(parts)
+            latest = await controller.get_latest_rate()
+            reference = latest and {
+                "USD": from_minor(latest.ust_rub_plus1_cents),
+                "CNY": from_minor(latest.cny_rub_plus2p_fens),
+            }
+            parsed = parse_rates(message.text, reference=reference)
+        except RateParseError as e:
+            await message.reply(
+                f"❌ {e}. Введите два курса — например:\n<code>93.15 12.85</code> или <code>USD 93,15 CNY 12,85</code>"
+            )
+            return
 
-            # Пересчитываем базовые курсы
-            usd_base = (usd_markup - Decimal("1.00")).quantize(Decimal("0.0001"))
-            cny_base = (cny_markup / Decimal("1.02")).quantize(Decimal("0.0001"))
+        # Подозрительные курсы сохраняем только после подтверждения
+        if parsed.warnings and not message.text.lstrip().startswith(CONFIRM_PREFIX):
+            await message.reply(
+                "⚠️ Проверьте курсы:\n" + "\n".join(parsed.warnings)
+                + f"\n\nЕсли всё верно, отправьте сообщение ещё раз, начав его с <code>{CONFIRM_PREFIX}</code>"
+            )
+            return
 
-            rate_cache.update({
-                "usd": usd_base,
-                "cny": cny_base,
-                "requested": False
-            })
+        # Округляем так же, как при сохранении, чтобы рассылка показала сохранённые курсы
+        usd_markup, cny_markup = (from_minor(to_minor(parsed.rates[c])) for c in ("USD", "CNY"))
 
+        try:
+            # Базовые курсы пересчитываем по действующим правилам наценки,
+            # курсы с наценкой сохраняем ровно такими, как их ввели
+            markups = await controller.get_markup_engine()
             await controller.add_rates(
-                ust=float(usd_base),
-                cny=float(cny_base),
-                date=date.today()
+                ust=markups.remove("USD", today(), usd_markup),
+                cny=markups.remove("CNY", today(), cny_markup),
+                date=today(),
+                marked=(usd_markup, cny_markup),
             )
 
             logger.info("💾 Курсы успешно сохранены")
 
-            await bot.send_message(
-                MANAGER_CHAT_ID,
-                f"<b>📊 Курсы на {date.today().strftime('%d.%m.%Y')}:</b>\n\n"
-                f"🇺🇸 USD: <b>{usd_markup:.2f}₽</b>\n"
-                f"🇨🇳 CNY: <b>{cny_markup:.2f}₽</b>"
-            )
-
             if has_today:
                 await message.reply("✅ Курсы обновлены.")
             else:
                 await message.reply("✅ Курсы получены и сохранены.")
+
+            # Рассылка идёт в фоне и не задерживает ответ оператору
+            task = asyncio.create_task(announce_rates(
+                today(),
+                f"<b>📊 Курсы на {today().strftime('%d.%m.%Y')}:</b>\n\n"
+                f"🇺🇸 USD: <b>{usd_markup:.2f}₽</b>\n"
+                f"🇨🇳 CNY: <b>{cny_markup:.2f}₽</b>"
+            ))
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
         except Exception as e:
             logger.warning(f"Ошибка обработки курсов: {e}")
-            await message.reply("❌ Ошибка. Убедитесь, что введены два корректных числа.")
+            await message.reply("❌ Ошибка при сохранении курсов.")
 
 # --- Entry point ---
 
-async def main():
+def start_scheduler():
+    get_leader().start()
+    scheduler = get_scheduler()
+    # Jobs are idempotent per day, so a replica starting a few minutes late still catches up
     scheduler.add_job(
         request_currency_inputs,
-        CronTrigger(hour=10, minute=0, day_of_week="mon-fri"),
+        CronTrigger(hour=10, minute=0, day_of_week="mon-fri", timezone=BOT_TIMEZONE),
+        misfire_grace_time=600,
+        coalesce=True,
     )
     scheduler.add_job(
         check_repeat_request,
-        CronTrigger(hour=12, minute=0, day_of_week="mon-fri"),
+        CronTrigger(hour=12, minute=0, day_of_week="mon-fri", timezone=BOT_TIMEZONE),
+        misfire_grace_time=600,
+        coalesce=True,
     )
     scheduler.start()
 
+async def main():
+    start_scheduler()
+
+    await warm_up_pool()
+    metrics_server = await serve_metrics() if METRICS_ENABLED and METRICS_PORT else None
+
     logger.info("🚀 Бот запущен и готов принимать сообщения")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(get_bot())
+    finally:
+        if metrics_server:
+            metrics_server.close()
+        await get_leader().stop()
+        await dispose_engine()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,92 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from cache import clear_local_caches
+from logger import setup_logger
+
+logger = setup_logger(__name__, level="INFO")
+
+RATES_CHANNEL = "rates_updated"
+SUBSCRIBER_QUEUE_SIZE = 8
+LISTEN_RETRY_DELAY = 5
+
+
+class Event:
+    __slots__ = ("name", "data", "sse")
+
+    def __init__(self, name: str, data: str):
+        self.name = name
+        self.data = data
+        # Encoded once per publish, not once per subscriber
+        self.sse = f"event: {name}\ndata: {data}\n\n".encode()
+
+
+class Broadcaster:
+    """Fans events out to in-process subscribers, each with its own bounded queue.
+
+    A subscriber that can't keep up loses its oldest pending events instead of
+    slowing down the publisher or the other subscribers.
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: set[asyncio.Queue] = set()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+    def publish(self, name: str, data: str) -> None:
+        event = Event(name, data)
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+broadcaster = Broadcaster()
+
+
+def _on_notify(connection, pid, channel, payload: str) -> None:
+    # Another process saved rates: cached reads and pages here are stale now. A
+    # writer on this host has already bumped the shared version, one elsewhere hasn't
+    clear_local_caches()
+    try:
+        message = json.loads(payload)
+        broadcaster.publish(message["event"], message["data"])
+    except (ValueError, KeyError) as e:
+        logger.warning(f"Некорректное уведомление в {channel}: {e}")
+
+
+async def listen_for_updates(engine: AsyncEngine) -> None:
+    """Relay Postgres NOTIFY messages from other processes (the bot) to local subscribers."""
+    while True:
+        try:
+            async with engine.connect() as conn:
+                raw = await conn.get_raw_connection()
+                driver = raw.driver_connection
+                closed = asyncio.Event()
+                driver.add_termination_listener(lambda _: closed.set())
+                await driver.add_listener(RATES_CHANNEL, _on_notify)
+                try:
+                    await closed.wait()
+                finally:
+                    if not driver.is_closed():
+                        await driver.remove_listener(RATES_CHANNEL, _on_notify)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Подписка на {RATES_CHANNEL} прервана: {e}")
+        await asyncio.sleep(LISTEN_RETRY_DELAY)
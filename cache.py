@@ -0,0 +1,183 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Hashable
+
+from database import database_url
+from metrics import METRICS_ENABLED, instrument_caches
+
+RATES_CACHE_TTL = float(os.getenv("RATES_CACHE_TTL", "60"))
+RATES_CACHE_SIZE = int(os.getenv("RATES_CACHE_SIZE", "512"))
+# Rows held across all entries; a long range is one entry but many rows
+RATES_CACHE_ROWS = int(os.getenv("RATES_CACHE_ROWS", "50000"))
+# Rendered pages only change when rates are saved, which clears them explicitly
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+# Processes on one host using the same database share an invalidation counter
+# in this file (by default named after the database URL); "none" keeps
+# invalidation per process
+CACHE_VERSION_FILE = os.getenv("CACHE_VERSION_FILE", "")
+
+MISSING = object()
+
+# (cache, key) -> the cache's generation when this task last missed the key.
+# Per task, so concurrent requests for the same key don't overwrite each other
+_misses: ContextVar[dict | None] = ContextVar("cache_misses", default=None)
+
+
+class TTLCache:
+    """Small in-process LRU cache whose entries expire after `ttl` seconds.
+
+    Holds at most `maxsize` entries and `maxrows` rows, counting each entry as
+    the number of rows passed to set(). Larger values are not cached at all,
+    and neither are values looked up before the cache was last invalidated.
+    """
+
+    def __init__(self, ttl: float = RATES_CACHE_TTL, maxsize: int = RATES_CACHE_SIZE,
+                 maxrows: int = RATES_CACHE_ROWS):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.maxrows = maxrows
+        self.hits = 0
+        self.misses = 0
+        self.rows = 0
+        # Bumped by every invalidation
+        self.generation = 0
+        # key -> (expires, value, rows)
+        self._data: OrderedDict[Hashable, tuple[float, Any, int]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value or MISSING (cached values may legitimately be None)."""
+        check_version()
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            _misses.set({**(_misses.get() or {}), (self, key): self.generation})
+            return MISSING
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, rows: int = 1) -> None:
+        if self.ttl <= 0 or self.maxsize <= 0 or rows > self.maxrows:
+            return
+        # The value was read after the miss; if the rates were saved since, here or
+        # in another process, it may be stale and must not outlive the invalidation
+        check_version()
+        missed = (_misses.get() or {}).get((self, key))
+        if missed is not None and missed != self.generation:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + self.ttl, value, rows)
+        self.rows += rows
+        while len(self._data) > self.maxsize or self.rows > self.maxrows:
+            self._remove(next(iter(self._data)))
+
+    def _remove(self, key: Hashable) -> None:
+        self.rows -= self._data.pop(key)[2]
+
+    def invalidate(self) -> None:
+        self._data.clear()
+        self.rows = 0
+        self.generation += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "rows": self.rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class SharedVersion:
+    """A 64-bit counter in a memory-mapped file, shared by the processes that map it.
+
+    Reading is a single load from shared memory, cheap enough to do on every
+    cache lookup. Increments are serialised with an exclusive flock.
+    """
+
+    _FORMAT = struct.Struct("Q")
+
+    def __init__(self, path: str):
+        import fcntl
+
+        self._flock = fcntl.flock
+        self._lock_ex, self._lock_un = fcntl.LOCK_EX, fcntl.LOCK_UN
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < self._FORMAT.size:
+            os.ftruncate(self._fd, self._FORMAT.size)
+        self._map = mmap.mmap(self._fd, self._FORMAT.size)
+
+    def read(self) -> int:
+        return self._FORMAT.unpack_from(self._map)[0]
+
+    def increment(self) -> int:
+        self._flock(self._fd, self._lock_ex)
+        try:
+            value = self.read() + 1
+            self._FORMAT.pack_into(self._map, 0, value)
+            return value
+        finally:
+            self._flock(self._fd, self._lock_un)
+
+
+rates_cache = TTLCache()
+page_cache = TTLCache(ttl=PAGE_CACHE_TTL, maxsize=8)
+if METRICS_ENABLED:
+    instrument_caches({"rates": rates_cache, "page": page_cache})
+
+
+# Opened on first lookup, None when sharing is off or unavailable (e.g. no fcntl on Windows)
+_shared_version: SharedVersion | None = MISSING
+_seen_version = 0
+
+
+def _get_shared_version() -> SharedVersion | None:
+    global _shared_version, _seen_version
+    if _shared_version is MISSING:
+        _shared_version = None
+        if CACHE_VERSION_FILE.lower() != "none":
+            path = CACHE_VERSION_FILE or os.path.join(
+                tempfile.gettempdir(), f"wave_rates_{hashlib.sha1(database_url().encode()).hexdigest()[:12]}.version")
+            try:
+                _shared_version = SharedVersion(path)
+                _seen_version = _shared_version.read()
+            except (ImportError, OSError):
+                pass
+    return _shared_version
+
+
+def check_version() -> None:
+    """Drop local entries if another process invalidated the caches since the last lookup."""
+    global _seen_version
+    shared = _get_shared_version()
+    if shared is not None:
+        version = shared.read()
+        if version != _seen_version:
+            _seen_version = version
+            clear_local_caches()
+
+
+def clear_local_caches() -> None:
+    rates_cache.invalidate()
+    page_cache.invalidate()
+
+
+def invalidate_rates() -> None:
+    """Clear the caches here and in every other process sharing CACHE_VERSION_FILE."""
+    global _seen_version
+    shared = _get_shared_version()
+    if shared is not None:
+        _seen_version = shared.increment()
+    clear_local_caches()
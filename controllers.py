@@ -1,66 +1,673 @@
-from typing import Optional
-from datetime import date
+import json
+from bisect import bisect_right
+from typing import Optional, AsyncIterator, Iterable, Iterator, Literal, Sequence, TYPE_CHECKING
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from models import CurrencyRates
+from sqlalchemy import select, update, func, cast, and_, or_, true, Date, Row
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import (
+    CurrencyRates, MarkupRules, RateObservations, DailyRateOHLC, AnnouncementChats, AnnouncementDeliveries, RateRequests,
+)
+from cache import rates_cache, invalidate_rates, MISSING
+from broadcast import broadcaster, RATES_CHANNEL
+from serializers import encode_rate
+from markup import MarkupEngine, MarkupRule, DEFAULT_RULES, DEFAULT_TIER, RATE_COLUMNS_BY_CURRENCY
+from money import MINOR_UNITS, RATE_ROUNDING, to_minor
+
+if TYPE_CHECKING:
+    from announcer import Delivery
+
+# Read paths select plain columns: rows are light tuples with attribute access
+# (row.date, row.ust_rub_cents, ...) that are safe to share through the cache
+RATE_COLUMNS = (
+    CurrencyRates.date,
+    CurrencyRates.ust_rub_cents,
+    CurrencyRates.cny_rub_fens,
+    CurrencyRates.ust_rub_plus1_cents,
+    CurrencyRates.cny_rub_plus2p_fens,
+)
+
+# Every save is also recorded per pair in rate_observations
+SNAPSHOT_PAIRS = {f"{currency}/RUB": base for currency, (base, _) in RATE_COLUMNS_BY_CURRENCY.items()}
+MANUAL_SOURCE = "manual"
+
+def dialect_insert(session: AsyncSession, model):
+    """INSERT supporting ON CONFLICT for the backend the session is bound to."""
+    if session.bind.dialect.name == "sqlite":
+        return sqlite_insert(model)
+    return pg_insert(model)
+
 
 class CurrencyController:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def add_rates(self, ust: float, cny: float, date: date) -> CurrencyRates:
-        ust_cents = int(ust * 100)
-        cny_fens = int(cny * 100)
-
-        # Calculate additional values
-        ust_plus1_cents = int((ust + 1) * 100)
-        cny_plus2p_fens = int((cny * 1.02) * 100)
-
-        existing = await self.get_rates_by_date(date)
-        if existing:
-            existing.ust_rub_cents = ust_cents
-            existing.cny_rub_fens = cny_fens
-            existing.ust_rub_plus1_cents = ust_plus1_cents
-            existing.cny_rub_plus2p_fens = cny_plus2p_fens
-
-            await self.session.commit()
-            await self.session.refresh(existing)
-            return existing
-
-        rates = CurrencyRates(
-            date=date,
-            ust_rub_cents=ust_cents,
-            cny_rub_fens=cny_fens,
-            ust_rub_plus1_cents=ust_plus1_cents,
-            cny_rub_plus2p_fens=cny_plus2p_fens
-        )
+    async def add_rates(self, ust: Decimal, cny: Decimal, date: date,
+                        marked: Optional[tuple[Decimal, Decimal]] = None) -> Row:
+        """Insert or overwrite the rates for `date` in a single statement.
 
-        self.session.add(rates)
-        await self.session.commit()
-        await self.session.refresh(rates)
+        `marked` are the default-tier (USD, CNY) rates as the operator entered them. They are
+        stored as given rather than recomputed from the rounded base rates, which can land
+        one minor unit lower.
+        """
+        markups = await self.get_markup_engine()
+        values = self._rate_values(ust, cny, date, markups, marked)
+        stmt = self._upsert().returning(*RATE_COLUMNS)
+        result = await self.session.execute(stmt, values)
+        rates = result.one()
+        await self._record_observations([values], MANUAL_SOURCE, datetime.now(timezone.utc))
+        await self._commit_and_announce("rates", encode_rate(rates).decode())
         return rates
 
-    async def get_rates_by_date(self, date: date) -> CurrencyRates | None:
-        query = select(CurrencyRates).where(CurrencyRates.date == date)
+    async def add_rates_many(
+        self,
+        rates: Iterable[tuple[date, Decimal, Decimal]],
+        batch_size: int = 1000,
+        source: str = MANUAL_SOURCE,
+    ) -> int:
+        """Upsert (date, ust, cny) triples, one INSERT ... ON CONFLICT per batch, in a single transaction.
+
+        History is recorded as observed at the start of each day, so loading the same file twice is idempotent.
+        """
+        markups = await self.get_markup_engine()
+        count = 0
+        # Postgres refuses to update the same row twice in one statement, so the last value per date wins
+        values = {}
+        for rate_date, ust, cny in rates:
+            values[rate_date] = self._rate_values(ust, cny, rate_date, markups)
+            if len(values) == batch_size:
+                await self._write_batch(list(values.values()), source)
+                count += len(values)
+                values = {}
+
+        if values:
+            await self._write_batch(list(values.values()), source)
+            count += len(values)
+
+        await self._commit_and_announce("reload", json.dumps({"count": count}))
+        return count
+
+    async def _write_batch(self, values: list[dict], source: str) -> None:
+        await self.session.execute(self._upsert(), values)
+        await self._record_observations(values, source)
+
+    async def _record_observations(self, values: list[dict], source: str,
+                                   observed_at: Optional[datetime] = None) -> None:
+        observations = [
+            {
+                "pair": pair,
+                "source": source,
+                "date": v["date"],
+                "observed_at": observed_at or datetime.combine(v["date"], time.min, timezone.utc),
+                "value_minor": v[column],
+            }
+            for v in values
+            for pair, column in SNAPSHOT_PAIRS.items()
+        ]
+        stmt = self._insert(RateObservations)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RateObservations.pair, RateObservations.source, RateObservations.observed_at],
+            set_={"value_minor": stmt.excluded.value_minor},
+        )
+        await self.session.execute(stmt, observations)
+        await self._refresh_daily_ohlc(source, [v["date"] for v in values])
+
+    async def _refresh_daily_ohlc(self, source: str, dates: list[date]) -> None:
+        """Recompute the daily rollup rows for `dates` from their observations in one INSERT ... SELECT."""
+        obs = RateObservations
+        spans = (
+            select(
+                obs.pair,
+                obs.source,
+                obs.date,
+                func.min(obs.value_minor).label("low_minor"),
+                func.max(obs.value_minor).label("high_minor"),
+                func.sum(obs.value_minor).label("sum_minor"),
+                func.count().label("count"),
+                func.min(obs.observed_at).label("opened_at"),
+                func.max(obs.observed_at).label("closed_at"),
+            )
+            .where(obs.pair.in_(list(SNAPSHOT_PAIRS)), obs.source == source, obs.date.in_(dates))
+            .group_by(obs.pair, obs.source, obs.date)
+            .subquery()
+        )
+        first, last = aliased(obs), aliased(obs)
+        rows = (
+            select(
+                spans.c.pair, spans.c.source, spans.c.date,
+                first.value_minor, spans.c.high_minor, spans.c.low_minor, last.value_minor,
+                spans.c.sum_minor, spans.c.count, spans.c.opened_at, spans.c.closed_at,
+            )
+            .select_from(spans)
+            .join(first, and_(first.pair == spans.c.pair, first.source == spans.c.source,
+                              first.observed_at == spans.c.opened_at))
+            .join(last, and_(last.pair == spans.c.pair, last.source == spans.c.source,
+                             last.observed_at == spans.c.closed_at))
+            # SQLite needs a WHERE to tell the upsert's ON CONFLICT apart from a join's ON
+            .where(true())
+        )
+        columns = ["pair", "source", "date", "open_minor", "high_minor", "low_minor", "close_minor",
+                   "sum_minor", "count", "opened_at", "closed_at"]
+        stmt = self._insert(DailyRateOHLC).from_select(columns, rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyRateOHLC.pair, DailyRateOHLC.source, DailyRateOHLC.date],
+            set_={column: stmt.excluded[column] for column in columns[3:]},
+        )
+        await self.session.execute(stmt)
+
+    @staticmethod
+    def _rate_values(ust: Decimal, cny: Decimal, date: date, markups: MarkupEngine,
+                     marked: Optional[tuple[Decimal, Decimal]] = None) -> dict:
+        ust_cents = to_minor(ust)
+        cny_fens = to_minor(cny)
+        return {
+            "date": date,
+            "ust_rub_cents": ust_cents,
+            "cny_rub_fens": cny_fens,
+            # Default-tier markups
+            "ust_rub_plus1_cents": to_minor(marked[0]) if marked else markups.apply("USD", date, ust_cents),
+            "cny_rub_plus2p_fens": to_minor(marked[1]) if marked else markups.apply("CNY", date, cny_fens),
+        }
+
+    def _insert(self, model):
+        return dialect_insert(self.session, model)
+
+    def _upsert(self):
+        stmt = self._insert(CurrencyRates)
+        return stmt.on_conflict_do_update(
+            index_elements=[CurrencyRates.date],
+            set_={
+                column: stmt.excluded[column]
+                for column in ("ust_rub_cents", "cny_rub_fens", "ust_rub_plus1_cents", "cny_rub_plus2p_fens")
+            },
+        )
+
+    async def get_rates_by_date(self, date: date) -> Row | None:
+        key = ("date", date)
+        cached = rates_cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        query = select(*RATE_COLUMNS).where(CurrencyRates.date == date)
         result = await self.session.execute(query)
-        return result.scalar_one_or_none()
+        rates = result.one_or_none()
+        rates_cache.set(key, rates)
+        return rates
 
     async def has_rates_for_date(self, date: date) -> bool:
-        query = select(func.count()).select_from(CurrencyRates).where(CurrencyRates.date == date)
+        return await self.get_rates_by_date(date) is not None
+
+    async def get_rates_as_of(self, on: date) -> Row | None:
+        """The last rates known on `on`: its own, or those of the closest earlier day (weekends, holidays)."""
+        return (await self.get_rates_as_of_many([on]))[0]
+
+    async def get_rates_as_of_many(self, dates: Sequence[date]) -> list[Row | None]:
+        """As-of rates for every date in `dates`, in the same order, from one range query.
+
+        None marks dates before the first known rate.
+        """
+        if not dates:
+            return []
+        rows = await self._as_of_span(min(dates), max(dates))
+        starts = [r.date for r in rows]
+        resolved = []
+        for on in dates:
+            index = bisect_right(starts, on)
+            resolved.append(rows[index - 1] if index else None)
+        return resolved
+
+    async def get_rates_filled(self, from_date: date, to_date: date) -> list[tuple[date, Row]]:
+        """(day, rates) for every calendar day of the range, carrying the last known rates forward.
+
+        Days before the first known rate are left out.
+        """
+        rows = await self._as_of_span(from_date, to_date)
+        filled = []
+        position = 0
+        current = None
+        day = from_date
+        while day <= to_date:
+            while position < len(rows) and rows[position].date <= day:
+                current = rows[position]
+                position += 1
+            if current is not None:
+                filled.append((day, current))
+            day += timedelta(days=1)
+        return filled
+
+    async def _as_of_span(self, from_date: date, to_date: date) -> list[Row]:
+        """Rates within the range plus the last one before it, so every day of the range resolves."""
+        key = ("as_of", from_date, to_date)
+        cached = rates_cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        # Both bounds are primary key lookups, the rows between them one index range scan
+        floor = select(func.max(CurrencyRates.date)).where(CurrencyRates.date <= from_date).scalar_subquery()
+        query = self._range_query(None, to_date).where(CurrencyRates.date >= func.coalesce(floor, from_date))
         result = await self.session.execute(query)
-        return result.scalar_one() > 0
+        rates = result.all()
+        rates_cache.set(key, rates, rows=len(rates))
+        return rates
+
+    async def get_rates_range(
+        self,
+        from_date: Optional[date],
+        to_date: Optional[date],
+        after: Optional[date] = None,
+        limit: Optional[int] = None,
+    ):
+        """Rates ordered by date; `after`/`limit` page through the range by date (keyset pagination)."""
+        key = ("range", from_date, to_date, after, limit)
+        cached = rates_cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        query = self._range_query(from_date, to_date)
+        if after:
+            query = query.where(CurrencyRates.date > after)
+        if limit:
+            query = query.limit(limit)
+        result = await self.session.execute(query)
+        rates = result.all()
+        rates_cache.set(key, rates, rows=len(rates))
+        return rates
+
+    async def stream_rates_range(
+        self,
+        from_date: Optional[date],
+        to_date: Optional[date],
+        chunk_size: int = 1000,
+    ) -> AsyncIterator[Row]:
+        """Yield rates from a server-side cursor, fetching `chunk_size` rows at a time."""
+        query = self._range_query(from_date, to_date).execution_options(yield_per=chunk_size)
+        result = await self.session.stream(query)
+        async for rates in result:
+            yield rates
 
-    async def get_rates_range(self, from_date: Optional[date], to_date: Optional[date]):
-        query = select(CurrencyRates)
+    @staticmethod
+    def _range_query(from_date: Optional[date], to_date: Optional[date]):
+        query = select(*RATE_COLUMNS)
         if from_date:
             query = query.where(CurrencyRates.date >= from_date)
         if to_date:
             query = query.where(CurrencyRates.date <= to_date)
-        query = query.order_by(CurrencyRates.date)
+        return query.order_by(CurrencyRates.date)
+
+    async def get_index_view(self, from_date: date, to_date: date) -> tuple[list[Row], Row | None]:
+        """Rates within the range plus the latest rate overall, in one query."""
+        latest_date = select(func.max(CurrencyRates.date)).scalar_subquery()
+        query = (
+            select(*RATE_COLUMNS)
+            .where(or_(CurrencyRates.date.between(from_date, to_date), CurrencyRates.date == latest_date))
+            .order_by(CurrencyRates.date)
+        )
         result = await self.session.execute(query)
-        return result.scalars().all()
+        rows = result.all()
+        in_range = [r for r in rows if from_date <= r.date <= to_date]
+        return in_range, rows[-1] if rows else None
+
+    async def get_latest_rate(self) -> Row | None:
+        key = ("latest",)
+        cached = rates_cache.get(key)
+        if cached is not MISSING:
+            return cached
 
-    async def get_latest_rate(self) -> CurrencyRates | None:
-        query = select(CurrencyRates).order_by(CurrencyRates.date.desc()).limit(1)
+        query = select(*RATE_COLUMNS).order_by(CurrencyRates.date.desc()).limit(1)
         result = await self.session.execute(query)
-        return result.scalar_one_or_none()
+        rates = result.one_or_none()
+        rates_cache.set(key, rates)
+        return rates
+
+    async def get_markup_engine(self) -> MarkupEngine:
+        key = ("markup_rules",)
+        cached = rates_cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        result = await self.session.execute(select(MarkupRules))
+        rules = [
+            MarkupRule(r.currency, r.kind, r.value, r.effective_from, r.tier)
+            for r in result.scalars()
+        ]
+        markups = MarkupEngine([*DEFAULT_RULES, *rules])
+        rates_cache.set(key, markups)
+        return markups
+
+    async def set_markup_rule(self, rule: MarkupRule) -> int:
+        """Store a rule and, for the default tier, rematerialise the affected rows. Returns rows updated."""
+        stmt = self._insert(MarkupRules).values(
+            currency=rule.currency,
+            tier=rule.tier,
+            kind=rule.kind,
+            value=rule.value,
+            effective_from=rule.effective_from,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MarkupRules.currency, MarkupRules.tier, MarkupRules.effective_from],
+            set_={"kind": stmt.excluded.kind, "value": stmt.excluded.value},
+        )
+        await self.session.execute(stmt)
+        invalidate_rates()
+
+        updated = 0
+        if rule.tier == DEFAULT_TIER:
+            updated = await self.rematerialize_markups(from_date=rule.effective_from, commit=False)
+        await self._commit_and_announce("reload", json.dumps({"count": updated}))
+        return updated
+
+    async def rematerialize_markups(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        commit: bool = True,
+    ) -> int:
+        """Recompute the stored default-tier columns with one set-based UPDATE per rule window."""
+        markups = await self.get_markup_engine()
+        updated = 0
+        for currency, (base_column, marked_column) in RATE_COLUMNS_BY_CURRENCY.items():
+            base = getattr(CurrencyRates, base_column)
+            for rule, start, end in markups.windows(currency, DEFAULT_TIER, from_date, to_date):
+                query = update(CurrencyRates).values({marked_column: self._markup_expression(rule, base)})
+                query = query.where(CurrencyRates.date >= max(start, from_date or start))
+                if end is not None:
+                    query = query.where(CurrencyRates.date < end)
+                if to_date is not None:
+                    query = query.where(CurrencyRates.date <= to_date)
+                result = await self.session.execute(query)
+                updated += result.rowcount
+
+        if commit:
+            await self._commit_and_announce("reload", json.dumps({"count": updated}))
+        return updated
+
+    async def _commit_and_announce(self, event: str, data: str) -> None:
+        """Commit, drop cached reads and tell push subscribers what changed.
+
+        On Postgres the event goes out as NOTIFY inside the transaction, so API
+        processes hear about writes made by the bot only once they are committed.
+        """
+        postgres = self.session.bind.dialect.name == "postgresql"
+        if postgres:
+            payload = json.dumps({"event": event, "data": data})
+            await self.session.execute(select(func.pg_notify(RATES_CHANNEL, payload)))
+
+        await self.session.commit()
+        invalidate_rates()
+        if not postgres:
+            broadcaster.publish(event, data)
+
+    @staticmethod
+    def _markup_expression(rule: MarkupRule, base):
+        if rule.kind == "add":
+            return base + to_minor(rule.value)
+        # Integer floor division rounds like MarkupRule.apply_minor (MARKUP_ROUNDING) on every backend
+        numerator, denominator = rule.value.as_integer_ratio()
+        return (base * numerator) // denominator
+
+    async def convert_many(
+        self,
+        items: Sequence[tuple[Decimal, str, date, Optional[str]]],
+    ) -> Iterator[tuple[int, int, date] | None]:
+        """Convert (amount, currency, date, tier) items to roubles at the as-of rates of their dates.
+
+        All rates come from one query up front; the returned iterator then does
+        the arithmetic lazily, in minor units, yielding (amount_minor,
+        rate_minor, rate_date) per item in order, or None when no rate (or no
+        markup rule in force for the tier on that day) applies. Tiers are not
+        checked here: one without rules prices like the default tier. A tier of
+        None converts at the base rate; tiers using the default rules convert at
+        the stored marked-up rate.
+        """
+        dates = sorted({on for _, _, on, _ in items})
+        resolved = dict(zip(dates, await self.get_rates_as_of_many(dates)))
+        markups = await self.get_markup_engine()
+
+        def convert() -> Iterator[tuple[int, int, date] | None]:
+            # Items repeat a handful of (currency, tier, day) combinations, each rate is worked out once
+            rates: dict[tuple, int | None] = {}
+            for amount, currency, on, tier in items:
+                row = resolved[on]
+                if row is None:
+                    yield None
+                    continue
+                key = (currency, tier, row.date)
+                rate = rates.get(key, MISSING)
+                if rate is MISSING:
+                    base_column, marked_column = RATE_COLUMNS_BY_CURRENCY[currency]
+                    base = getattr(row, base_column)
+                    if tier is None:
+                        rate = base
+                    elif markups.uses_default(currency, tier):
+                        # Same rate as /rates shows: the stored one, as entered
+                        rate = getattr(row, marked_column)
+                    else:
+                        try:
+                            rate = markups.apply(currency, row.date, base, tier)
+                        except LookupError:
+                            rate = None
+                    rates[key] = rate
+                if rate is None:
+                    yield None
+                else:
+                    yield int((amount * rate).to_integral_value(rounding=RATE_ROUNDING)), rate, row.date
+
+        return convert()
+
+    async def get_rates_with_markup(
+        self,
+        from_date: Optional[date],
+        to_date: Optional[date],
+        tier: str = DEFAULT_TIER,
+    ) -> list[dict]:
+        """Rates for any tier, with markups evaluated over the whole range at read time.
+
+        Where the tier uses the default rules, the stored marked-up rates are
+        returned instead: they hold the rates as entered, which recomputing from
+        the rounded base can miss by a minor unit.
+        """
+        rows = await self.get_rates_range(from_date, to_date)
+        markups = await self.get_markup_engine()
+        dates = [r.date for r in rows]
+        marked = {}
+        for currency, (base_column, marked_column) in RATE_COLUMNS_BY_CURRENCY.items():
+            if markups.uses_default(currency, tier):
+                marked[currency] = [getattr(r, marked_column) for r in rows]
+            else:
+                marked[currency] = markups.apply_many(currency, dates, [getattr(r, base_column) for r in rows], tier)
+        usd, cny = marked["USD"], marked["CNY"]
+        return [
+            {
+                "date": r.date,
+                "ust_rub": r.ust_rub_cents / MINOR_UNITS,
+                "cny_rub": r.cny_rub_fens / MINOR_UNITS,
+                "ust_rub_markup": None if u is None else u / MINOR_UNITS,
+                "cny_rub_markup": None if c is None else c / MINOR_UNITS,
+            }
+            for r, u, c in zip(rows, usd, cny)
+        ]
+
+    async def get_pair_rates(
+        self,
+        pairs: Iterable[str],
+        from_date: Optional[date],
+        to_date: Optional[date],
+        source: Optional[str] = None,
+    ) -> dict[str, list[Row]]:
+        """Every (date, source, observed_at, value_minor) observation per pair, fetched for all pairs in one query."""
+        pairs = tuple(dict.fromkeys(pairs))
+        key = ("pairs", pairs, from_date, to_date, source)
+        cached = rates_cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        query = select(
+            RateObservations.pair,
+            RateObservations.date,
+            RateObservations.source,
+            RateObservations.observed_at,
+            RateObservations.value_minor,
+        ).where(RateObservations.pair.in_(pairs))
+        if from_date:
+            query = query.where(RateObservations.date >= from_date)
+        if to_date:
+            query = query.where(RateObservations.date <= to_date)
+        if source:
+            query = query.where(RateObservations.source == source)
+        query = query.order_by(RateObservations.pair, RateObservations.date, RateObservations.observed_at)
+
+        result = await self.session.execute(query)
+        by_pair: dict[str, list[Row]] = {pair: [] for pair in pairs}
+        for row in result:
+            by_pair[row.pair].append(row)
+        rates_cache.set(key, by_pair, rows=sum(map(len, by_pair.values())))
+        return by_pair
+
+    async def get_ohlc(
+        self,
+        pair: str,
+        interval: Literal["day", "week", "month"],
+        from_date: Optional[date],
+        to_date: Optional[date],
+        source: Optional[str] = None,
+    ) -> list[Row]:
+        """Open/high/low/close, sum and count per period and source, aggregated in SQL from the daily rollup."""
+        key = ("ohlc", pair, interval, from_date, to_date, source)
+        cached = rates_cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        daily = DailyRateOHLC
+        period = self._period_start(daily.date, interval).label("period")
+        spans = select(
+            daily.pair,
+            daily.source,
+            period,
+            func.min(daily.date).label("first_date"),
+            func.max(daily.date).label("last_date"),
+            func.max(daily.high_minor).label("high_minor"),
+            func.min(daily.low_minor).label("low_minor"),
+            func.sum(daily.sum_minor).label("sum_minor"),
+            func.sum(daily.count).label("count"),
+        ).where(daily.pair == pair)
+        if from_date:
+            spans = spans.where(daily.date >= from_date)
+        if to_date:
+            spans = spans.where(daily.date <= to_date)
+        if source:
+            spans = spans.where(daily.source == source)
+        spans = spans.group_by(daily.pair, daily.source, period).subquery()
+
+        first, last = aliased(daily), aliased(daily)
+        query = (
+            select(
+                spans.c.period,
+                spans.c.source,
+                first.open_minor,
+                spans.c.high_minor,
+                spans.c.low_minor,
+                last.close_minor,
+                spans.c.sum_minor,
+                spans.c.count,
+            )
+            .select_from(spans)
+            .join(first, and_(first.pair == spans.c.pair, first.source == spans.c.source,
+                              first.date == spans.c.first_date))
+            .join(last, and_(last.pair == spans.c.pair, last.source == spans.c.source,
+                             last.date == spans.c.last_date))
+            .order_by(spans.c.source, spans.c.period)
+        )
+        result = await self.session.execute(query)
+        bars = result.all()
+        rates_cache.set(key, bars, rows=len(bars))
+        return bars
+
+    def _period_start(self, column, interval: str):
+        if interval == "day":
+            return column
+        if self.session.bind.dialect.name == "sqlite":
+            modifiers = ("weekday 0", "-6 days") if interval == "week" else ("start of month",)
+            return func.date(column, *modifiers, type_=Date)
+        return cast(func.date_trunc(interval, column), Date)
+
+
+class AnnouncementController:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_active_chat_ids(self) -> list[int]:
+        query = select(AnnouncementChats.chat_id).where(AnnouncementChats.active.is_(True))
+        result = await self.session.execute(query)
+        return list(result.scalars())
+
+    async def subscribe(self, chat_id: int, title: Optional[str] = None) -> None:
+        stmt = dialect_insert(self.session, AnnouncementChats).values(chat_id=chat_id, title=title, active=True)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AnnouncementChats.chat_id],
+            set_={"title": stmt.excluded.title, "active": True},
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+    async def unsubscribe(self, chat_ids: Iterable[int]) -> None:
+        query = update(AnnouncementChats).where(AnnouncementChats.chat_id.in_(list(chat_ids))).values(active=False)
+        await self.session.execute(query)
+        await self.session.commit()
+
+    async def record_deliveries(self, rate_date: date, deliveries: Iterable["Delivery"]) -> None:
+        updated_at = datetime.now(timezone.utc)
+        rows = [
+            {
+                "date": rate_date,
+                "chat_id": d.chat_id,
+                "status": d.status,
+                "attempts": d.attempts,
+                "error": d.error[:255] if d.error else None,
+                "updated_at": updated_at,
+            }
+            for d in deliveries
+        ]
+        if not rows:
+            return
+        stmt = dialect_insert(self.session, AnnouncementDeliveries)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AnnouncementDeliveries.date, AnnouncementDeliveries.chat_id],
+            set_={column: stmt.excluded[column] for column in ("status", "attempts", "error", "updated_at")},
+        )
+        await self.session.execute(stmt, rows)
+        await self.session.commit()
+
+
+class RateRequestsController:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def was_requested(self, day: date) -> bool:
+        result = await self.session.execute(select(RateRequests.date).where(RateRequests.date == day))
+        return result.first() is not None
+
+    async def mark_requested(self, day: date) -> bool:
+        """Record the morning request; False if it was already made for `day` (by any replica)."""
+        stmt = dialect_insert(self.session, RateRequests).values(date=day, requested_at=datetime.now(timezone.utc))
+        stmt = stmt.on_conflict_do_nothing(index_elements=[RateRequests.date]).returning(RateRequests.date)
+        result = await self.session.execute(stmt)
+        claimed = result.first() is not None
+        await self.session.commit()
+        return claimed
+
+    async def mark_reminded(self, day: date) -> bool:
+        """Record the reminder; False if one was already sent for `day`."""
+        now = datetime.now(timezone.utc)
+        stmt = dialect_insert(self.session, RateRequests).values(date=day, requested_at=now, reminded_at=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RateRequests.date],
+            set_={"reminded_at": now},
+            where=RateRequests.reminded_at.is_(None),
+        ).returning(RateRequests.date)
+        result = await self.session.execute(stmt)
+        claimed = result.first() is not None
+        await self.session.commit()
+        return claimed
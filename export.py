@@ -0,0 +1,70 @@
+import struct
+import sys
+from array import array
+from datetime import date
+from typing import AsyncIterator, Iterable, Any
+
+# Columnar export of the integer rate columns.
+#
+# Binary layout ("RATECOL1"), all integers little-endian:
+#   header: b"RATECOL1", uint16 column count, then per column a uint8 name
+#           length followed by the ASCII name; every column is int32
+#   blocks: uint32 row count N, then each column as N contiguous int32 values
+#   end:    a block with N == 0
+# `date` is stored as days since 1970-01-01.
+
+EXPORT_COLUMNS = ("date", "ust_rub_cents", "cny_rub_fens", "ust_rub_plus1_cents", "cny_rub_plus2p_fens")
+MAGIC = b"RATECOL1"
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def columnar_header() -> bytes:
+    parts = [MAGIC, struct.pack("<H", len(EXPORT_COLUMNS))]
+    for name in EXPORT_COLUMNS:
+        encoded = name.encode("ascii")
+        parts.append(struct.pack("<B", len(encoded)) + encoded)
+    return b"".join(parts)
+
+
+def columnar_block(rows: Iterable[Any]) -> bytes:
+    columns = [array("i") for _ in EXPORT_COLUMNS]
+    for r in rows:
+        columns[0].append(r.date.toordinal() - EPOCH_ORDINAL)
+        columns[1].append(r.ust_rub_cents)
+        columns[2].append(r.cny_rub_fens)
+        columns[3].append(r.ust_rub_plus1_cents)
+        columns[4].append(r.cny_rub_plus2p_fens)
+
+    if sys.byteorder != "little":
+        for column in columns:
+            column.byteswap()
+    return struct.pack("<I", len(columns[0])) + b"".join(column.tobytes() for column in columns)
+
+
+def csv_header() -> bytes:
+    return (",".join(EXPORT_COLUMNS) + "\n").encode()
+
+
+def csv_block(rows: Iterable[Any]) -> bytes:
+    return "".join(
+        f"{r.date.isoformat()},{r.ust_rub_cents},{r.cny_rub_fens},{r.ust_rub_plus1_cents},{r.cny_rub_plus2p_fens}\n"
+        for r in rows
+    ).encode()
+
+
+async def export_chunks(rows: AsyncIterator[Any], fmt: str, chunk_rows: int) -> AsyncIterator[bytes]:
+    columnar = fmt == "columnar"
+    yield columnar_header() if columnar else csv_header()
+
+    block = columnar_block if columnar else csv_block
+    chunk = []
+    async for r in rows:
+        chunk.append(r)
+        if len(chunk) == chunk_rows:
+            yield block(chunk)
+            chunk = []
+
+    if chunk:
+        yield block(chunk)
+    if columnar:
+        yield struct.pack("<I", 0)
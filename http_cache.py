@@ -0,0 +1,94 @@
+import gzip
+import hashlib
+from datetime import date
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+# Past days rarely change, but markup rules and imports can still rewrite them,
+# so clients revalidate with the ETag instead of keeping them for good
+HISTORY_CACHE_CONTROL = "public, max-age=3600, must-revalidate"
+# Today's rates may still be resent
+SHORT_CACHE_CONTROL = "public, max-age=60, must-revalidate"
+
+
+def cache_control_for(last_date: Optional[date]) -> str:
+    if last_date is not None and last_date < date.today():
+        return HISTORY_CACHE_CONTROL
+    return SHORT_CACHE_CONTROL
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def conditional_response(request: Request, body: bytes, cache_control: str,
+                         media_type: str = "application/json") -> Response:
+    etag = make_etag(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def conditional_json(request: Request, content: Any, cache_control: str) -> Response:
+    body = JSONResponse(jsonable_encoder(content)).body
+    return conditional_response(request, body, cache_control)
+
+
+class RenderedPage:
+    """A rendered page kept together with its compressed variant and their ETags."""
+    __slots__ = ("body", "gzipped", "etag", "gzip_etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=9)
+        self.etag = make_etag(body)
+        # Strong ETags are per representation, so the compressed bytes get their own
+        self.gzip_etag = self.etag[:-1] + '-gzip"'
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip, honouring q-values ("gzip;q=0" refuses it)."""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.strip().lower()] = q
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def page_response(request: Request, page: RenderedPage, cache_control: str = "no-cache",
+                  media_type: str = "text/html; charset=utf-8") -> Response:
+    compressed = accepts_gzip(request.headers.get("accept-encoding", ""))
+    etag = page.gzip_etag if compressed else page.etag
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if compressed:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=page.gzipped, media_type=media_type, headers=headers)
+    return Response(content=page.body, media_type=media_type, headers=headers)
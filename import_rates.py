@@ -0,0 +1,73 @@
+"""Bulk import of historical rates.
+
+    python import_rates.py history.csv
+    python import_rates.py history.json --batch-size 5000
+
+CSV files need `date`, `ust` and `cny` columns, JSON files hold a list of
+objects with the same keys. Dates are YYYY-MM-DD, rates are base rates without
+markup, exactly as the bot stores them. Rates may use a decimal comma and
+thousands separators ("1 234,56").
+"""
+if __name__ == "__main__":
+    # Run as a script: read .env before the modules below read their settings
+    from dotenv import load_dotenv
+    load_dotenv()
+
+import argparse
+import asyncio
+import csv
+import json
+from datetime import date
+from itertools import islice
+from pathlib import Path
+from decimal import Decimal
+from typing import Iterator
+
+from controllers import CurrencyController
+from database import get_session, dispose_engine
+from logger import setup_logger
+from rate_parser import parse_number
+
+logger = setup_logger(__name__, level="INFO")
+
+
+def read_rates(path: Path, fmt: str) -> Iterator[tuple[date, Decimal, Decimal]]:
+    with path.open(encoding="utf-8", newline="") as f:
+        records = csv.DictReader(f) if fmt == "csv" else json.load(f)
+        for record in records:
+            yield (
+                date.fromisoformat(record["date"]),
+                parse_number(str(record["ust"])),
+                parse_number(str(record["cny"])),
+            )
+
+
+async def import_rates(path: Path, fmt: str, batch_size: int) -> int:
+    rates = read_rates(path, fmt)
+    total = 0
+    while chunk := list(islice(rates, batch_size)):
+        async with get_session() as session:
+            total += await CurrencyController(session).add_rates_many(chunk, batch_size=batch_size, source="import")
+        logger.info(f"💾 Импортировано {total} строк")
+    return total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Import historical currency rates")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=("csv", "json"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    fmt = args.format or args.path.suffix.lstrip(".").lower()
+    if fmt not in ("csv", "json"):
+        parser.error("Cannot detect the file format, pass --format")
+
+    try:
+        await import_rates(args.path, fmt, args.batch_size)
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+import asyncio
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from logger import setup_logger
+
+logger = setup_logger(__name__, level="INFO")
+
+LEADER_LOCK_KEY = 0x52415445    # "RATE"
+LEADER_CHECK_INTERVAL = 30
+
+
+class LeaderElection:
+    """Elects one leader among bot replicas with a Postgres session-level advisory lock.
+
+    The lock is held on a dedicated connection for as long as it stays open, so
+    when the leader dies its lock is released and another replica takes over on
+    its next check. Backends without advisory locks run a single replica and
+    always lead.
+    """
+
+    def __init__(self, engine: AsyncEngine, key: int = LEADER_LOCK_KEY,
+                 check_interval: float = LEADER_CHECK_INTERVAL):
+        self.engine = engine
+        self.key = key
+        self.check_interval = check_interval
+        self.is_leader = engine.dialect.name != "postgresql"
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.engine.dialect.name == "postgresql" and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._campaign()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.is_leader:
+                    logger.warning(f"Потеряно лидерство: {e}")
+            finally:
+                self.is_leader = False
+            await asyncio.sleep(self.check_interval)
+
+    async def _campaign(self) -> None:
+        """Try for the lock every check_interval and keep its connection alive once held."""
+        conn: AsyncConnection = await self.engine.connect()
+        try:
+            # Autocommit so the connection never sits idle inside a transaction
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            while True:
+                if self.is_leader:
+                    await conn.execute(text("SELECT 1"))
+                else:
+                    result = await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key})
+                    if result.scalar():
+                        self.is_leader = True
+                        logger.info("👑 Этот экземпляр бота стал ведущим")
+                await asyncio.sleep(self.check_interval)
+        finally:
+            # Returning the connection to the pool would keep the session-level lock:
+            # the pool's reset only rolls back. Closing the backend connection releases it.
+            await asyncio.shield(self._discard(conn))
+
+    @staticmethod
+    async def _discard(conn: AsyncConnection) -> None:
+        await conn.invalidate()
+        await conn.close()
@@ -1,30 +1,160 @@
 import logging
+import queue
 import sys
-import requests
+import threading
+import time
 import os
 from typing import Literal
 
 LogLevel = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
 
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+MAX_MESSAGE_LENGTH = 4096
+MIN_SEND_INTERVAL = 3.0     # Telegram allows about 20 messages per minute to a group
+
+
 class TelegramLogHandler(logging.Handler):
-    def __init__(self, token: str, chat_id: str, min_level: int = logging.ERROR):
+    """Forwards records to a Telegram chat from a background thread.
+
+    emit() only enqueues, so logging never blocks the event loop. Records are
+    collected for `interval` seconds, identical messages are merged with a
+    counter and the batch is sent as few messages as the length limit allows.
+    """
+
+    def __init__(self, token: str, chat_id: str, min_level: int = logging.ERROR,
+                 interval: float = 5.0, max_queue: int = 1000, api_url: str = TELEGRAM_API_URL):
         super().__init__(level=min_level)
         self.token = token
         self.chat_id = chat_id
-        self.api_url = f"https://api.telegram.org/bot{self.token}/sendMessage"
+        self.api_url = f"{api_url}/bot{self.token}/sendMessage"
+        self.interval = interval
+        self.dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._send_lock = threading.Lock()
+        self._next_send = 0.0
+        self._stop = threading.Event()
+        # Started by the first record, so setting up loggers on import starts no thread
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
 
     def emit(self, record):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="telegram-log", daemon=True)
+                    self._thread.start()
         try:
-            log_entry = self.format(record)
-            payload = {
-                "chat_id": self.chat_id,
-                "text": f"🛠️ *{record.levelname}* из `{record.name}`:\n```\n{log_entry}\n```",
-                "parse_mode": "Markdown"
-            }
-            requests.post(self.api_url, data=payload)
+            self._queue.put_nowait((record.levelname, record.name, record.getMessage(), self.format(record)))
+        except queue.Full:
+            self.dropped += 1
         except Exception:
             self.handleError(record)
 
+    def flush(self):
+        self._send_pending()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 10)
+        super().close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._send_pending()
+        self._send_pending()
+
+    def _send_pending(self):
+        with self._send_lock:
+            merged: dict[tuple, list] = {}
+            while True:
+                try:
+                    levelname, name, message, log_entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                entry = merged.setdefault((levelname, name, message), [log_entry, 0])
+                entry[1] += 1
+
+            dropped, self.dropped = self.dropped, 0
+            if not merged and not dropped:
+                return
+
+            entries = [
+                self._format_entry(levelname, name, log_entry, count)
+                for (levelname, name, _), (log_entry, count) in merged.items()
+            ]
+            if dropped:
+                entries.append(f"⚠️ Пропущено записей: {dropped}")
+
+            for text in self._pack(entries):
+                self._post(text)
+
+    @staticmethod
+    def _format_entry(levelname: str, name: str, log_entry: str, count: int) -> str:
+        repeated = f" (×{count})" if count > 1 else ""
+        header = f"🛠️ *{levelname}* из `{name}`{repeated}:\n```\n"
+        room = MAX_MESSAGE_LENGTH - len(header) - len("\n```")
+        if len(log_entry) > room:
+            log_entry = log_entry[:room - 1] + "…"
+        return f"{header}{log_entry}\n```"
+
+    @staticmethod
+    def _pack(entries: list[str]) -> list[str]:
+        messages, current = [], ""
+        for entry in entries:
+            if current and len(current) + 2 + len(entry) > MAX_MESSAGE_LENGTH:
+                messages.append(current)
+                current = ""
+            current = f"{current}\n\n{entry}" if current else entry
+        if current:
+            messages.append(current)
+        return messages
+
+    def _post(self, text: str):
+        # Imported on first send, most processes never log to Telegram
+        import requests
+
+        payload = {"chat_id": self.chat_id, "text": text, "parse_mode": "Markdown"}
+        for _ in range(3):
+            delay = self._next_send - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_send = time.monotonic() + MIN_SEND_INTERVAL
+            try:
+                response = requests.post(self.api_url, data=payload, timeout=10)
+            except requests.RequestException as e:
+                sys.stderr.write(f"Telegram log handler: {e}\n")
+                return
+
+            if response.status_code != 429:
+                return
+            # Flood control: Telegram tells how long to wait before retrying
+            try:
+                retry_after = response.json()["parameters"]["retry_after"]
+            except (ValueError, KeyError, TypeError):
+                retry_after = MIN_SEND_INTERVAL
+            self._next_send = time.monotonic() + retry_after
+
+
+# One handler per process: a single thread and send rate for every logger posting to the chat
+_telegram_handler: TelegramLogHandler | None = None
+_telegram_handler_lock = threading.Lock()
+
+
+def _shared_telegram_handler(token: str, chat_id: str, level: LogLevel,
+                             formatter: logging.Formatter) -> TelegramLogHandler:
+    global _telegram_handler
+    with _telegram_handler_lock:
+        if _telegram_handler is None:
+            _telegram_handler = TelegramLogHandler(token=token, chat_id=chat_id)
+            _telegram_handler.setFormatter(formatter)
+            _telegram_handler.setLevel(level)
+        # Each logger's own level still filters its records
+        _telegram_handler.setLevel(min(_telegram_handler.level, logging.getLevelName(level)))
+        return _telegram_handler
+
+
 def setup_logger(name: str = None, level: LogLevel = "INFO") -> logging.Logger:
     logger = logging.getLogger(name)
     if logger.hasHandlers():
@@ -54,9 +184,6 @@ def setup_logger(name: str = None, level: LogLevel = "INFO") -> logging.Logger:
         tg_token = os.getenv("TELEGRAM_LOG_TOKEN")
         tg_chat_id = os.getenv("TELEGRAM_LOG_CHAT_ID")
         if tg_token and tg_chat_id:
-            tg_handler = TelegramLogHandler(token=tg_token, chat_id=tg_chat_id)
-            tg_handler.setFormatter(formatter)
-            tg_handler.setLevel(level)
-            logger.addHandler(tg_handler)
+            logger.addHandler(_shared_telegram_handler(tg_token, tg_chat_id, level, formatter))
 
     return logger
@@ -0,0 +1,109 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, Sequence
+
+from money import to_minor, multiply_minor
+
+DEFAULT_TIER = "default"
+
+# Columns of CurrencyRates holding the base and the materialised default-tier rate per currency
+RATE_COLUMNS_BY_CURRENCY = {
+    "USD": ("ust_rub_cents", "ust_rub_plus1_cents"),
+    "CNY": ("cny_rub_fens", "cny_rub_plus2p_fens"),
+}
+
+
+@dataclass(frozen=True)
+class MarkupRule:
+    currency: str
+    kind: str            # "add": base + value, "mul": base * value
+    value: Decimal
+    effective_from: date
+    tier: str = DEFAULT_TIER
+
+    def apply_minor(self, base_minor: int) -> int:
+        if self.kind == "add":
+            return base_minor + to_minor(self.value)
+        return multiply_minor(base_minor, self.value)
+
+    def remove(self, marked: Decimal) -> Decimal:
+        if self.kind == "add":
+            return marked - self.value
+        return marked / self.value
+
+
+DEFAULT_RULES = (
+    MarkupRule("USD", "add", Decimal("1.00"), date(1970, 1, 1)),
+    MarkupRule("CNY", "mul", Decimal("1.02"), date(1970, 1, 1)),
+)
+
+
+class MarkupEngine:
+    """Resolves the markup rule in force for a currency, tier and date."""
+
+    def __init__(self, rules: Iterable[MarkupRule] = DEFAULT_RULES):
+        # A later rule for the same currency, tier and date replaces an earlier one
+        unique = {(r.currency, r.tier, r.effective_from): r for r in rules}
+        self._rules: dict[tuple[str, str], list[MarkupRule]] = {}
+        for rule in sorted(unique.values(), key=lambda r: r.effective_from):
+            self._rules.setdefault((rule.currency, rule.tier), []).append(rule)
+        self._starts = {key: [r.effective_from for r in rules] for key, rules in self._rules.items()}
+
+    def tiers(self) -> set[str]:
+        return {tier for _, tier in self._rules}
+
+    def _key(self, currency: str, tier: str) -> tuple[str, str]:
+        # Tiers only need rules for the currencies where they differ from the default
+        if (currency, tier) in self._rules:
+            return currency, tier
+        return currency, DEFAULT_TIER
+
+    def uses_default(self, currency: str, tier: str) -> bool:
+        """Whether `tier` prices `currency` with the default rules, whose results are stored with the rates."""
+        return self._key(currency, tier)[1] == DEFAULT_TIER
+
+    def rule_for(self, currency: str, on: date, tier: str = DEFAULT_TIER) -> MarkupRule:
+        key = self._key(currency, tier)
+        index = bisect_right(self._starts.get(key, []), on) - 1
+        if index < 0:
+            raise LookupError(f"No {tier} markup rule for {currency} on {on}")
+        return self._rules[key][index]
+
+    def apply(self, currency: str, on: date, base_minor: int, tier: str = DEFAULT_TIER) -> int:
+        return self.rule_for(currency, on, tier).apply_minor(base_minor)
+
+    def remove(self, currency: str, on: date, marked: Decimal, tier: str = DEFAULT_TIER) -> Decimal:
+        return self.rule_for(currency, on, tier).remove(marked)
+
+    def apply_many(self, currency: str, dates: Sequence[date], base_minor: Sequence[int],
+                   tier: str = DEFAULT_TIER) -> list[int]:
+        """Apply markups over a date-ordered series, walking the rule windows once instead of a lookup per row."""
+        windows = self.windows(currency, tier, dates[0], dates[-1]) if dates else []
+        result = []
+        position = 0
+        for rule, start, end in windows:
+            while position < len(dates) and dates[position] < start:
+                result.append(None)
+                position += 1
+            while position < len(dates) and (end is None or dates[position] < end):
+                result.append(rule.apply_minor(base_minor[position]))
+                position += 1
+        result.extend([None] * (len(dates) - position))
+        return result
+
+    def windows(self, currency: str, tier: str, from_date: date | None = None,
+                to_date: date | None = None) -> list[tuple[MarkupRule, date, date | None]]:
+        """(rule, start, end) spans where each rule applies; `end` is exclusive, None means open-ended."""
+        rules = self._rules.get(self._key(currency, tier), [])
+        spans = []
+        for i, rule in enumerate(rules):
+            start = rule.effective_from
+            end = rules[i + 1].effective_from if i + 1 < len(rules) else None
+            if to_date is not None and start > to_date:
+                break
+            if from_date is not None and end is not None and end <= from_date:
+                continue
+            spans.append((rule, start, end))
+        return spans
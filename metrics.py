@@ -0,0 +1,199 @@
+"""Prometheus metrics without the client library.
+
+Metrics are module-level objects updated in-process and rendered in the text
+exposition format by `render()`, which the API serves on /metrics. The bot in
+polling mode has no HTTP server, so it can expose the same text on
+METRICS_PORT with `serve_metrics()`.
+"""
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; most requests are served from cache in well under a millisecond
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Gauge:
+    """A gauge set directly, or read from `callback` (returning {labels: value}) at scrape time.
+
+    Callbacks reading totals kept elsewhere are exported with kind="counter".
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 callback: Callable[[], dict[tuple, float]] | None = None, kind: str = "gauge"):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labelnames = labelnames
+        self.callback = callback
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        values = self.callback() if self.callback else self._values
+        for labels, value in values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = _labels((*self.labelnames, "le"), (*labels, bound))
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+REGISTRY: list[Gauge | Histogram] = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.collect()) + "\n"
+
+
+http_request_duration = register(Histogram(
+    "http_request_duration_seconds", "API request latency until the last body byte", ("method", "route", "status")))
+db_query_duration = register(Histogram(
+    "db_query_duration_seconds", "Database statement execution time", ("operation",)))
+db_sessions_active = register(Gauge("db_sessions_active", "Database sessions currently open"))
+bot_handler_duration = register(Histogram(
+    "bot_handler_duration_seconds", "Bot update handler duration", ("handler",)))
+telegram_request_duration = register(Histogram(
+    "telegram_request_duration_seconds", "Telegram Bot API call latency", ("method", "status")))
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing HTTP requests per route.
+
+    Routes are labelled by endpoint name, which the router leaves in the
+    shared scope, so unknown paths can't blow up the label set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            endpoint = scope.get("endpoint")
+            route = getattr(endpoint, "__name__", type(endpoint).__name__) if endpoint else "unmatched"
+            http_request_duration.observe(time.perf_counter() - started, scope["method"], route, status)
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement executed by `engine` and export its pool state."""
+    from sqlalchemy import event
+
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_query_duration.observe(time.perf_counter() - context._metrics_started, operation)
+
+    pool = sync_engine.pool
+    if hasattr(pool, "checkedout"):
+        register(Gauge("db_pool_connections", "Pooled database connections", ("state",), lambda: {
+            ("checked_out",): pool.checkedout(),
+            ("idle",): pool.checkedin(),
+            ("overflow",): max(pool.overflow(), 0),
+        }))
+
+
+def instrument_caches(caches: dict) -> None:
+    """Export hit/miss counters and the hit ratio of each TTLCache in `caches` (name -> cache)."""
+
+    def read(stat: str):
+        return lambda: {(name,): cache.stats()[stat] for name, cache in caches.items()}
+
+    register(Gauge("cache_hits_total", "Cache lookups answered from the cache", ("cache",), read("hits"), "counter"))
+    register(Gauge("cache_misses_total", "Cache lookups that went to the database", ("cache",), read("misses"), "counter"))
+    register(Gauge("cache_entries", "Entries currently cached", ("cache",), read("size")))
+    register(Gauge("cache_hit_ratio", "Share of lookups answered from the cache", ("cache",), read("hit_ratio")))
+
+
+async def serve_metrics(port: int = METRICS_PORT) -> asyncio.Server:
+    """Minimal HTTP endpoint returning `render()` for processes without the API."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                + f"Content-Type: {CONTENT_TYPE}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, port=port)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Date
+from sqlalchemy import Column, Integer, BigInteger, Boolean, Date, DateTime, String, Numeric, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -12,5 +12,85 @@ class CurrencyRates(Base):
     ust_rub_cents = Column(Integer, nullable=False)         # UST/RUB * 100
     cny_rub_fens = Column(Integer, nullable=False)          # CNY/RUB * 100
 
+    # Default-tier markups materialised from markup_rules (see markup.py)
     ust_rub_plus1_cents = Column(Integer, nullable=False)   # (UST+1) * 100
-    cny_rub_plus2p_fens = Column(Integer, nullable=False)   # (CNY*1.02) * 100 
\ No newline at end of file
+    cny_rub_plus2p_fens = Column(Integer, nullable=False)   # (CNY*1.02) * 100
+
+
+class MarkupRules(Base):
+    __tablename__ = "markup_rules"
+    __table_args__ = (UniqueConstraint("currency", "tier", "effective_from"),)
+
+    id = Column(Integer, primary_key=True)
+    currency = Column(String(3), nullable=False)            # USD, CNY
+    tier = Column(String(32), nullable=False, default="default")
+    kind = Column(String(8), nullable=False)                # "add" | "mul"
+    value = Column(Numeric(12, 6), nullable=False)          # +1.00 RUB or *1.02
+    effective_from = Column(Date, nullable=False)
+
+
+class RateObservations(Base):
+    """Append-only rate history: every submitted value per currency pair and source."""
+    __tablename__ = "rate_observations"
+    __table_args__ = (
+        UniqueConstraint("pair", "source", "observed_at"),
+        # Covers range scans over several pairs, in (pair, date, observed_at) order, so they
+        # are answered from the index alone without a sort
+        Index("ix_rate_observations_pair_date", "pair", "date", "observed_at",
+              postgresql_include=["source", "value_minor"]),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    pair = Column(String(7), nullable=False)                # "USD/RUB"
+    source = Column(String(32), nullable=False)             # "manual", "import", ...
+    date = Column(Date, nullable=False)
+    observed_at = Column(DateTime(timezone=True), nullable=False)
+    value_minor = Column(BigInteger, nullable=False)        # rate * 100
+
+
+class DailyRateOHLC(Base):
+    """Per-day rollup of rate_observations, refreshed for the affected days on every write."""
+    __tablename__ = "rate_daily_ohlc"
+
+    pair = Column(String(7), primary_key=True)
+    source = Column(String(32), primary_key=True)
+    date = Column(Date, primary_key=True)
+
+    open_minor = Column(BigInteger, nullable=False)
+    high_minor = Column(BigInteger, nullable=False)
+    low_minor = Column(BigInteger, nullable=False)
+    close_minor = Column(BigInteger, nullable=False)
+    sum_minor = Column(BigInteger, nullable=False)          # for averages over any period
+    count = Column(Integer, nullable=False)
+    opened_at = Column(DateTime(timezone=True), nullable=False)
+    closed_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class AnnouncementChats(Base):
+    """Chats and channels that receive the daily rate announcement."""
+    __tablename__ = "announcement_chats"
+
+    chat_id = Column(BigInteger, primary_key=True)
+    title = Column(String(255), nullable=True)
+    active = Column(Boolean, nullable=False, default=True)
+
+
+class AnnouncementDeliveries(Base):
+    """Outcome of the latest announcement of a day's rates per chat."""
+    __tablename__ = "announcement_deliveries"
+
+    date = Column(Date, primary_key=True)
+    chat_id = Column(BigInteger, primary_key=True)
+    status = Column(String(16), nullable=False)             # "sent", "failed", "forbidden"
+    attempts = Column(Integer, nullable=False)
+    error = Column(String(255), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class RateRequests(Base):
+    """Days on which the operator was asked for rates; shared by all bot replicas."""
+    __tablename__ = "rate_requests"
+
+    date = Column(Date, primary_key=True)
+    requested_at = Column(DateTime(timezone=True), nullable=False)
+    reminded_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,43 @@
+import decimal
+import os
+from decimal import Decimal
+
+# Rates are stored as integers in minor units (kopecks per cent/fen by default).
+# Changing RATE_DIGITS rescales what the stored integers mean, so it has to be
+# set before any rates are saved.
+RATE_DIGITS = int(os.getenv("RATE_DIGITS", "2"))
+MINOR_UNITS = 10 ** RATE_DIGITS
+# How entered rates with more digits than RATE_DIGITS are rounded
+RATE_ROUNDING = getattr(decimal, os.getenv("RATE_ROUNDING", "ROUND_HALF_UP"))
+# Multiplicative markups always round down, like the set-based SQL in CurrencyController
+MARKUP_ROUNDING = decimal.ROUND_FLOOR
+
+_QUANTUM = Decimal(1).scaleb(-RATE_DIGITS)
+# Fraction digits as repr(minor / MINOR_UNITS) prints them: trailing zeros dropped, at least one digit
+_FRACTIONS = [f"{i:0{RATE_DIGITS}d}".rstrip("0") or "0" for i in range(MINOR_UNITS)] if RATE_DIGITS <= 4 else None
+
+
+def to_minor(value: Decimal | int | str, rounding: str = RATE_ROUNDING) -> int:
+    """Convert a rate in major units to an integer amount of minor units, rounding explicitly."""
+    return int(Decimal(value).quantize(_QUANTUM, rounding=rounding).scaleb(RATE_DIGITS))
+
+
+def from_minor(minor: int) -> Decimal:
+    return Decimal(minor).scaleb(-RATE_DIGITS)
+
+
+def multiply_minor(minor: int, factor: Decimal, rounding: str = MARKUP_ROUNDING) -> int:
+    return int((minor * factor).to_integral_value(rounding=rounding))
+
+
+def format_minor(minor: int) -> str:
+    """JSON number text for `minor`, byte-identical to repr(minor / MINOR_UNITS) without going through a float.
+
+    Holds while the value has at most 15 significant digits, far beyond any exchange rate.
+    """
+    whole, fraction = divmod(abs(minor), MINOR_UNITS)
+    if _FRACTIONS is not None:
+        digits = _FRACTIONS[fraction]
+    else:
+        digits = f"{fraction:0{RATE_DIGITS}d}".rstrip("0") or "0"
+    return f"-{whole}.{digits}" if minor < 0 else f"{whole}.{digits}"
@@ -0,0 +1,153 @@
+import re
+from itertools import permutations
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Mapping, Sequence
+
+# Currencies the operator submits, in the order unlabelled numbers are expected
+DEFAULT_CURRENCIES = ("USD", "CNY")
+# A rate further than this from the reference value is flagged as a likely typo
+MAX_DEVIATION = Decimal("0.2")
+
+CURRENCY_ALIASES = {
+    "USD": ("usd", "ust", "usdt", "$", "доллар", "долл", "дол"),
+    "CNY": ("cny", "rmb", "¥", "юань", "юаня", "юаней"),
+    "EUR": ("eur", "€", "евро"),
+}
+
+# A sign glued to a previous number is a range dash ("93.15-12.85"), not a minus
+_SIGN = r"(?:(?<![\d.,])[-+−])?"
+# Thousands separated by spaces, apostrophes, repeated ./, groups or the separator the decimal
+# part doesn't use ("1.093,15"); the last . or , before digits is decimal
+_NUMBER = rf"{_SIGN}(?:\d{{1,3}}(?:(?:[   ']\d{{3}})+|(?:[.,]\d{{3}}){{2,}}|(?:\.\d{{3}})+(?=,\d)|(?:,\d{{3}})+(?=\.\d))(?:[.,]\d+)?|\d+(?:[.,]\d+)?)"
+_ALIAS_TO_CURRENCY = {
+    alias: currency for currency, aliases in CURRENCY_ALIASES.items() for alias in aliases
+}
+_LABEL = "|".join(sorted((re.escape(a) for a in _ALIAS_TO_CURRENCY), key=len, reverse=True))
+# Labels must not be glued to surrounding letters ("ust" in "august"); roubles are noise
+_TOKEN = re.compile(
+    rf"(?P<label>(?<![^\W\d_])(?:{_LABEL})(?![^\W\d_]))|(?P<number>{_NUMBER})",
+    re.IGNORECASE,
+)
+_GROUP_SEPARATORS = re.compile(r"[   ']")
+
+
+class RateParseError(ValueError):
+    pass
+
+
+@dataclass
+class ParsedRates:
+    rates: dict[str, Decimal]
+    labelled: bool
+    warnings: list[str] = field(default_factory=list)
+
+
+def parse_number(text: str) -> Decimal:
+    """Parse a number written with any common decimal and thousands separators."""
+    text = _GROUP_SEPARATORS.sub("", text.strip()).replace("−", "-")
+    if "." in text and "," in text:
+        decimal_sep = "." if text.rfind(".") > text.rfind(",") else ","
+        text = text.replace("," if decimal_sep == "." else ".", "")
+    elif text.count(",") > 1 or text.count(".") > 1:
+        text = text.replace(",", "").replace(".", "")
+    try:
+        return Decimal(text.replace(",", "."))
+    except InvalidOperation:
+        raise RateParseError(f"Не удалось разобрать число «{text}»") from None
+
+
+def parse_rates(
+    text: str,
+    currencies: Sequence[str] = DEFAULT_CURRENCIES,
+    reference: Mapping[str, Decimal] | None = None,
+    max_deviation: Decimal = MAX_DEVIATION,
+) -> ParsedRates:
+    """Extract one rate per currency from free text.
+
+    Numbers may carry a label before or after them ("USD 93,15", "12.85 юаня").
+    Without labels they are matched to the reference rates by proximity, or,
+    without references, to `currencies` from the largest to the smallest value.
+    Rates that are not positive are rejected; rates more than `max_deviation`
+    away from their reference are returned with a warning.
+    """
+    tokens = []
+    for match in _TOKEN.finditer(text):
+        if match["label"]:
+            tokens.append((_ALIAS_TO_CURRENCY[match["label"].lower()], None))
+        else:
+            value = parse_number(match["number"])
+            if value <= 0:
+                raise RateParseError(f"Курс должен быть положительным: {match['number']}")
+            tokens.append((None, value))
+
+    labelled: dict[str, Decimal] = {}
+    unlabelled: list[Decimal] = []
+    for currency, value in _pair_labels(tokens):
+        if currency is None:
+            unlabelled.append(value)
+        elif currency in labelled:
+            raise RateParseError(f"Курс {currency} указан дважды")
+        else:
+            labelled[currency] = value
+
+    unknown = set(labelled) - set(currencies)
+    if unknown:
+        raise RateParseError(f"Неизвестная валюта: {', '.join(sorted(unknown))}")
+
+    missing = [c for c in currencies if c not in labelled]
+    if len(unlabelled) != len(missing):
+        raise RateParseError(
+            f"Ожидалось курсов: {len(currencies)}, найдено: {len(labelled) + len(unlabelled)}"
+        )
+
+    rates = dict(labelled)
+    rates.update(_assign_unlabelled(unlabelled, missing, reference))
+    rates = {currency: rates[currency] for currency in currencies}
+
+    warnings = []
+    for currency, value in rates.items():
+        previous = reference.get(currency) if reference else None
+        if previous and abs(value - previous) / previous > max_deviation:
+            warnings.append(f"{currency}: {value} сильно отличается от предыдущего курса {previous}")
+
+    return ParsedRates(rates, labelled=not unlabelled, warnings=warnings)
+
+
+def _pair_labels(tokens: list[tuple[str | None, Decimal | None]]):
+    """Attach each label to its number.
+
+    Labels are read as prefixes ("USD 93.15 CNY 12.85") unless the first one
+    follows a number, in which case the whole message uses suffixes
+    ("93.15 USD 12.85 CNY").
+    """
+    first_label = next((i for i, (currency, _) in enumerate(tokens) if currency), None)
+    suffixes = bool(first_label) and tokens[first_label - 1][0] is None
+    if suffixes:
+        tokens = tokens[::-1]
+
+    pending = None
+    for currency, value in tokens:
+        if currency is not None:
+            if pending is not None:
+                raise RateParseError(f"Для валюты {pending} не указан курс")
+            pending = currency
+        else:
+            yield pending, value
+            pending = None
+    if pending is not None:
+        raise RateParseError(f"Для валюты {pending} не указан курс")
+
+
+def _assign_unlabelled(values: list[Decimal], currencies: list[str],
+                       reference: Mapping[str, Decimal] | None) -> dict[str, Decimal]:
+    if not values:
+        return {}
+    if reference and all(reference.get(c) for c in currencies):
+        # The assignment with the smallest total log-ratio to the references, so one
+        # far-off value can't take another currency's closest match
+        def distance(assignment):
+            return sum(abs((v / reference[c]).ln()) for c, v in zip(currencies, assignment))
+
+        return dict(zip(currencies, min(permutations(values), key=distance)))
+    return dict(zip(currencies, sorted(values, reverse=True)))
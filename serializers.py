@@ -0,0 +1,59 @@
+from datetime import date
+from typing import Iterable, Any
+
+from money import MINOR_UNITS, format_minor
+
+# Rate rows expose date, ust_rub_cents, cny_rub_fens, ust_rub_plus1_cents and
+# cny_rub_plus2p_fens. The encoders below write the same bytes FastAPI's
+# JSONResponse would produce for CurrencyRatesResponse, without building
+# intermediate dicts or running Pydantic validation per row; numbers are
+# formatted straight from the stored integers without a float round trip.
+
+
+def rate_to_dict(r: Any) -> dict:
+    return {
+        "date": r.date,
+        "ust_rub": r.ust_rub_cents / MINOR_UNITS,
+        "cny_rub": r.cny_rub_fens / MINOR_UNITS,
+        "ust_rub_plus1": r.ust_rub_plus1_cents / MINOR_UNITS,
+        "cny_rub_plus2p": r.cny_rub_plus2p_fens / MINOR_UNITS,
+    }
+
+
+def _rate_fields(r: Any) -> str:
+    return (
+        f'"ust_rub":{format_minor(r.ust_rub_cents)},'
+        f'"cny_rub":{format_minor(r.cny_rub_fens)},'
+        f'"ust_rub_plus1":{format_minor(r.ust_rub_plus1_cents)},'
+        f'"cny_rub_plus2p":{format_minor(r.cny_rub_plus2p_fens)}'
+    )
+
+
+def encode_rate(r: Any) -> bytes:
+    return f'{{"date":"{r.date.isoformat()}",{_rate_fields(r)}}}'.encode()
+
+
+def encode_rate_as_of(on: date, r: Any) -> bytes:
+    """Rates in force on `on`; `rate_date` is the day they were set. null if none were known yet."""
+    if r is None:
+        return b"null"
+    return f'{{"date":"{on.isoformat()}","rate_date":"{r.date.isoformat()}",{_rate_fields(r)}}}'.encode()
+
+
+def encode_conversion(result: tuple[int, int, date] | None) -> bytes:
+    """One converted item: the rouble amount, the rate applied and the day it was set; null if unconvertible."""
+    if result is None:
+        return b"null"
+    amount_minor, rate_minor, rate_date = result
+    return (
+        f'{{"amount_rub":{format_minor(amount_minor)},"rate":{format_minor(rate_minor)},'
+        f'"rate_date":"{rate_date.isoformat()}"}}'
+    ).encode()
+
+
+def encode_rates(rows: Iterable[Any]) -> bytes:
+    return b"[" + b",".join(encode_rate(r) for r in rows) + b"]"
+
+
+def encode_rates_ndjson(rows: Iterable[Any]) -> bytes:
+    return b"".join(encode_rate(r) + b"\n" for r in rows)
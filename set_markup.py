@@ -0,0 +1,46 @@
+"""Add or change a markup rule.
+
+    python set_markup.py USD add 1.50 --from 2025-06-01
+    python set_markup.py CNY mul 1.03 --from 2025-06-01 --tier wholesale
+
+Default-tier rules are materialised into the stored rates from the effective
+date onwards; other tiers are evaluated when rates are read.
+"""
+if __name__ == "__main__":
+    # Run as a script: read .env before the modules below read their settings
+    from dotenv import load_dotenv
+    load_dotenv()
+
+import argparse
+import asyncio
+from datetime import date
+from decimal import Decimal
+
+from controllers import CurrencyController
+from database import get_session, dispose_engine
+from logger import setup_logger
+from markup import MarkupRule, DEFAULT_TIER, RATE_COLUMNS_BY_CURRENCY
+
+logger = setup_logger(__name__, level="INFO")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Add or change a markup rule")
+    parser.add_argument("currency", choices=sorted(RATE_COLUMNS_BY_CURRENCY))
+    parser.add_argument("kind", choices=("add", "mul"))
+    parser.add_argument("value", type=Decimal)
+    parser.add_argument("--from", dest="effective_from", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--tier", default=DEFAULT_TIER)
+    args = parser.parse_args()
+
+    rule = MarkupRule(args.currency, args.kind, args.value, args.effective_from, args.tier)
+    try:
+        async with get_session() as session:
+            updated = await CurrencyController(session).set_markup_rule(rule)
+        logger.info(f"💾 Правило сохранено, пересчитано строк: {updated}")
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
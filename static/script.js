@@ -1,6 +1,6 @@
 const form = document.getElementById('range-form');
-form.addEventListener('submit', async (e) => {
-    e.preventDefault();
+
+async function loadRates(revalidate = false) {
     const fromDate = document.getElementById('from_date').value;
     const toDate = document.getElementById('to_date').value;
 
@@ -8,7 +8,8 @@ form.addEventListener('submit', async (e) => {
     if (fromDate) params.append('from_date', fromDate);
     if (toDate) params.append('to_date', toDate);
 
-    const resp = await fetch(`/rates?${params.toString()}`);
+    // After an update the browser's copy may be stale, so check it against the server
+    const resp = await fetch(`/rates?${params.toString()}`, revalidate ? {cache: 'no-cache'} : {});
     if (!resp.ok) {
         alert('Не удалось загрузить данные');
         return;
@@ -26,4 +27,28 @@ form.addEventListener('submit', async (e) => {
             <td>${r.cny_rub_plus2p.toFixed(2)}</td>`;
         tbody.appendChild(row);
     });
+}
+
+function showLatest(r) {
+    let latest = document.getElementById('latest-rate');
+    if (!latest) {
+        latest = document.createElement('div');
+        latest.id = 'latest-rate';
+        form.before(latest);
+    }
+    latest.textContent = `Актуальный курс на ${r.date}: ` +
+        `USD/RUB ${r.ust_rub.toFixed(2)}, CNY/RUB ${r.cny_rub.toFixed(2)}`;
+}
+
+form.addEventListener('submit', async (e) => {
+    e.preventDefault();
+    await loadRates();
+});
+
+// Live updates instead of polling
+const events = new EventSource('/rates/events');
+events.addEventListener('rates', (e) => {
+    showLatest(JSON.parse(e.data));
+    loadRates(true);
 });
+events.addEventListener('reload', () => loadRates(true));
@@ -0,0 +1,33 @@
+import os
+
+# Set before the application modules read them on import
+os.environ.setdefault("LOG_OUTPUTS", "none")
+os.environ.setdefault("CACHE_VERSION_FILE", "none")
+os.environ.setdefault("METRICS_ENABLED", "false")
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from cache import clear_local_caches
+from database import make_engine
+from models import Base
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    clear_local_caches()
+    yield
+    clear_local_caches()
+
+
+@pytest.fixture
+def database_url(tmp_path) -> str:
+    return f"sqlite+aiosqlite:///{tmp_path / 'test.sqlite3'}"
+
+
+async def open_sessions(url: str):
+    """A fresh schema at `url`; returns (engine, sessionmaker). Dispose the engine when done."""
+    engine = make_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
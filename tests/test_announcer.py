@@ -0,0 +1,92 @@
+import asyncio
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import SendMessage
+
+from announcer import Announcer, SendRateLimiter
+
+
+class FakeSender:
+    """Fails each chat's sends with its scripted errors in turn, then succeeds; records the send times."""
+
+    def __init__(self, errors: dict[int, list[Exception]] | None = None):
+        self.errors = errors or {}
+        self.sent: list[tuple[int, float]] = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.sent.append((chat_id, asyncio.get_running_loop().time()))
+        script = self.errors.get(chat_id)
+        if script:
+            raise script.pop(0)
+
+
+def method(chat_id: int) -> SendMessage:
+    return SendMessage(chat_id=chat_id, text="Курсы")
+
+
+def broadcast(sender: FakeSender, chat_ids: list[int], **kwargs):
+    limiter = SendRateLimiter(rate=1000, per_chat_interval=0)
+    return asyncio.run(Announcer(sender, limiter=limiter, **kwargs).broadcast(chat_ids, "Курсы"))
+
+
+def test_retry_after_pauses_then_sends():
+    sender = FakeSender({1: [TelegramRetryAfter(method(1), "Flood control exceeded", retry_after=1)]})
+    [delivery] = broadcast(sender, [1])
+    assert (delivery.status, delivery.attempts) == ("sent", 2)
+    (_, first), (_, second) = sender.sent
+    assert second - first >= 1
+
+
+def test_forbidden_is_not_retried():
+    sender = FakeSender({1: [TelegramForbiddenError(method(1), "bot was kicked from the group chat")]})
+    deliveries = broadcast(sender, [1, 2])
+    assert [(d.chat_id, d.status, d.attempts) for d in deliveries] == [(1, "forbidden", 1), (2, "sent", 1)]
+    assert "kicked" in deliveries[0].error
+    assert [chat for chat, _ in sender.sent] == [1, 2]
+
+
+def test_gives_up_after_max_attempts():
+    sender = FakeSender({1: [TelegramServerError(method(1), "Bad Gateway") for _ in range(5)]})
+    [delivery] = broadcast(sender, [1], max_attempts=3)
+    assert (delivery.status, delivery.attempts) == ("failed", 3)
+    assert "Bad Gateway" in delivery.error
+    assert len(sender.sent) == 3
+
+
+def test_duplicate_chats_get_one_message():
+    sender = FakeSender()
+    deliveries = broadcast(sender, [1, 2, 1])
+    assert [d.chat_id for d in deliveries] == [1, 2]
+    assert len(sender.sent) == 2
+
+
+def limiter_slots(limiter: SendRateLimiter, chat_ids: list[int]) -> list[tuple[int, float]]:
+    """(chat, seconds after the start) of each slot handed out, in the order they were granted."""
+    async def main():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        slots = []
+
+        async def send(chat_id: int):
+            await limiter.wait(chat_id)
+            slots.append((chat_id, loop.time() - started))
+
+        await asyncio.gather(*(send(chat_id) for chat_id in chat_ids))
+        return slots
+
+    return asyncio.run(main())
+
+
+def test_limiter_spaces_sends_per_chat():
+    slots = limiter_slots(SendRateLimiter(rate=1000, per_chat_interval=0.1), [1, 2, 1, 2, 1])
+    for chat_id in (1, 2):
+        times = [t for chat, t in slots if chat == chat_id]
+        assert all(b - a >= 0.09 for a, b in zip(times, times[1:]))
+    # Another chat isn't held up by the first one's interval
+    assert [t for chat, t in slots if chat == 2][0] < 0.05
+
+
+def test_limiter_spaces_sends_globally():
+    slots = limiter_slots(SendRateLimiter(rate=20, per_chat_interval=0), [1, 2, 3, 4])
+    times = [t for _, t in slots]
+    assert all(b - a >= 0.04 for a, b in zip(times, times[1:]))
@@ -0,0 +1,101 @@
+import asyncio
+from datetime import date, timedelta
+from decimal import Decimal
+
+import httpx
+from fastapi import FastAPI
+
+import api
+import database
+from conftest import open_sessions
+from controllers import CurrencyController
+
+# Thursday, Friday, then Monday and Wednesday: a weekend and a Tuesday without rates
+RATE_DAYS = [date(2024, 2, 29), date(2024, 3, 1), date(2024, 3, 4), date(2024, 3, 6)]
+FRIDAY, MONDAY, WEDNESDAY = RATE_DAYS[1:]
+SUNDAY = date(2024, 3, 3)
+
+
+async def seed(sessions) -> None:
+    async with sessions() as session:
+        controller = CurrencyController(session)
+        for i, day in enumerate(RATE_DAYS):
+            await controller.add_rates(Decimal(90 + i), Decimal(12 + i), day)
+
+
+def run(database_url: str, monkeypatch, call):
+    """Seed RATE_DAYS and run `call(controller, client)`."""
+    app = FastAPI()
+    app.include_router(api.router)
+
+    async def main():
+        engine, sessions = await open_sessions(database_url)
+        monkeypatch.setattr(database, "async_session", sessions)
+        try:
+            await seed(sessions)
+            transport = httpx.ASGITransport(app=app)
+            async with sessions() as session, httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await call(CurrencyController(session), client)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def rate_dates(resolved) -> list:
+    return [None if r is None else r.date for r in resolved]
+
+
+def test_as_of_many_keeps_request_order(database_url, monkeypatch):
+    dates = [SUNDAY, date(2024, 2, 28), FRIDAY, SUNDAY, date(2024, 3, 5), date(2024, 3, 10)]
+
+    async def call(controller, client):
+        return await controller.get_rates_as_of_many(dates)
+
+    assert rate_dates(run(database_url, monkeypatch, call)) == [FRIDAY, None, FRIDAY, FRIDAY, MONDAY, WEDNESDAY]
+
+
+def test_filled_carries_rates_forward_from_a_gap(database_url, monkeypatch):
+    async def call(controller, client):
+        return (await controller.get_rates_filled(date(2024, 3, 2), date(2024, 3, 7)),
+                await controller.get_rates_filled(date(2024, 2, 26), FRIDAY))
+
+    filled, before_first = run(database_url, monkeypatch, call)
+    assert [day for day, _ in filled] == [date(2024, 3, 2) + timedelta(days=i) for i in range(6)]
+    assert [r.date for _, r in filled] == [FRIDAY, FRIDAY, MONDAY, MONDAY, WEDNESDAY, WEDNESDAY]
+    # Days before the first known rate are left out
+    assert [(day, r.date) for day, r in before_first] == [(RATE_DAYS[0], RATE_DAYS[0]), (FRIDAY, FRIDAY)]
+
+
+def test_as_of_endpoints(database_url, monkeypatch):
+    async def call(controller, client):
+        return [
+            await client.get(f"/rates/{SUNDAY}?as_of=true"),
+            await client.get(f"/rates/{SUNDAY}"),
+            await client.get("/rates/2024-02-28?as_of=true"),
+            await client.post("/rates/as-of", json={"dates": [str(MONDAY), "2024-02-01", str(SUNDAY), str(MONDAY)]}),
+        ]
+
+    weekend, exact, before_first, many = run(database_url, monkeypatch, call)
+    assert weekend.status_code == 200 and weekend.json()["date"] == str(FRIDAY)
+    assert weekend.json()["ust_rub"] == 91.0
+    assert exact.status_code == 404 and before_first.status_code == 404
+    body = many.json()
+    assert body[1] is None
+    assert [(r["date"], r["rate_date"]) for r in (body[0], body[2], body[3])] == [
+        (str(MONDAY), str(MONDAY)), (str(SUNDAY), str(FRIDAY)), (str(MONDAY), str(MONDAY)),
+    ]
+
+
+def test_fill_endpoint(database_url, monkeypatch):
+    async def call(controller, client):
+        return await client.get("/rates?from_date=2024-03-02&to_date=2024-03-05&fill=true")
+
+    response = run(database_url, monkeypatch, call)
+    assert response.status_code == 200
+    assert [(r["date"], r["rate_date"], r["ust_rub"]) for r in response.json()] == [
+        ("2024-03-02", "2024-03-01", 91.0),
+        ("2024-03-03", "2024-03-01", 91.0),
+        ("2024-03-04", "2024-03-04", 92.0),
+        ("2024-03-05", "2024-03-04", 92.0),
+    ]
@@ -0,0 +1,75 @@
+from contextvars import copy_context
+
+import cache as cache_module
+from cache import MISSING, SharedVersion, TTLCache, rates_cache
+
+
+def test_evicts_least_recently_used_entries_by_rows():
+    cache = TTLCache(ttl=60, maxsize=10, maxrows=100)
+    cache.set("a", "a", rows=40)
+    cache.set("b", "b", rows=40)
+    assert cache.get("a") == "a"
+    cache.set("c", "c", rows=40)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == "a" and cache.get("c") == "c"
+    assert cache.rows == 80
+
+
+def test_skips_values_larger_than_the_row_budget():
+    cache = TTLCache(ttl=60, maxsize=10, maxrows=100)
+    cache.set("small", "small", rows=10)
+    cache.set("history", "history", rows=101)
+    assert cache.get("history") is MISSING
+    assert cache.get("small") == "small" and cache.rows == 10
+
+
+def test_replacing_and_invalidating_keep_the_row_count():
+    cache = TTLCache(ttl=60, maxsize=10, maxrows=100)
+    cache.set("a", 1, rows=30)
+    cache.set("a", 2, rows=50)
+    assert cache.rows == 50 and cache.get("a") == 2
+    cache.invalidate()
+    assert cache.rows == 0 and cache.get("a") is MISSING
+
+
+def test_entry_limit():
+    cache = TTLCache(ttl=60, maxsize=2, maxrows=100)
+    for key in "abc":
+        cache.set(key, key)
+    assert cache.get("a") is MISSING and cache.stats()["size"] == 2
+
+
+def test_values_looked_up_before_an_invalidation_are_not_stored():
+    cache = TTLCache(ttl=60, maxsize=10, maxrows=100)
+    request = copy_context()
+    assert request.run(cache.get, "a") is MISSING
+    cache.invalidate()  # rates saved while the request was reading them
+    request.run(cache.set, "a", "stale")
+    assert copy_context().run(cache.get, "a") is MISSING
+
+    assert request.run(cache.get, "a") is MISSING
+    request.run(cache.set, "a", "fresh")
+    assert request.run(cache.get, "a") == "fresh"
+
+
+def test_concurrent_lookups_keep_their_own_miss():
+    cache = TTLCache(ttl=60, maxsize=10, maxrows=100)
+    slow, fast = copy_context(), copy_context()
+    slow.run(cache.get, "a")
+    cache.invalidate()
+    fast.run(cache.get, "a")
+    fast.run(cache.set, "a", "fresh")
+    slow.run(cache.set, "a", "stale")
+    assert fast.run(cache.get, "a") == "fresh"
+
+
+def test_stale_set_after_another_process_bumps_the_version(tmp_path, monkeypatch):
+    path = str(tmp_path / "version")
+    monkeypatch.setattr(cache_module, "_shared_version", SharedVersion(path))
+    monkeypatch.setattr(cache_module, "_seen_version", 0)
+    request = copy_context()
+    assert request.run(rates_cache.get, "a") is MISSING
+    SharedVersion(path).increment()  # another worker saved rates
+    assert copy_context().run(rates_cache.get, "b") is MISSING  # a later lookup here notices
+    request.run(rates_cache.set, "a", "stale")
+    assert copy_context().run(rates_cache.get, "a") is MISSING
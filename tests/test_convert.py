@@ -0,0 +1,152 @@
+import asyncio
+import decimal
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import api
+import controllers
+import database
+from conftest import open_sessions
+from controllers import CurrencyController
+from markup import DEFAULT_TIER
+from money import from_minor
+
+DAY = date(2024, 3, 1)
+
+
+async def save_rates(controller: CurrencyController, on: date, usd: str, cny: str) -> None:
+    """Save marked-up rates the way the bot does."""
+    markups = await controller.get_markup_engine()
+    usd, cny = Decimal(usd), Decimal(cny)
+    await controller.add_rates(markups.remove("USD", on, usd), markups.remove("CNY", on, cny), on, marked=(usd, cny))
+
+
+def call_api(database_url: str, monkeypatch, requests: list[tuple[str, str, dict | None]]) -> list[httpx.Response]:
+    """Save rates for DAY, then send each (method, url, json body) to the API."""
+    app = FastAPI()
+    app.include_router(api.router)
+
+    async def main():
+        engine, sessions = await open_sessions(database_url)
+        monkeypatch.setattr(database, "async_session", sessions)
+        try:
+            async with sessions() as session:
+                await save_rates(CurrencyController(session), DAY, "94.15", "5.00")
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return [await client.request(method, url, json=body) for method, url, body in requests]
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def convert(database_url: str, items: list[tuple]) -> list:
+    """Save rates for DAY and three days later, then convert the items."""
+    async def main():
+        engine, sessions = await open_sessions(database_url)
+        try:
+            async with sessions() as session:
+                controller = CurrencyController(session)
+                await save_rates(controller, DAY, "94.15", "12.85")
+                await save_rates(controller, DAY + timedelta(days=3), "95.00", "13.00")
+                return list(await controller.convert_many(items))
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_results_in_request_order_with_nulls(database_url):
+    monday = DAY + timedelta(days=3)
+    results = convert(database_url, [
+        (Decimal(10), "USD", monday, None),
+        (Decimal(10), "USD", DAY - timedelta(days=1), DEFAULT_TIER),
+        (Decimal(10), "CNY", DAY + timedelta(days=1), None),
+        (Decimal(10), "USD", DAY, DEFAULT_TIER),
+        (Decimal(10), "USD", DAY - timedelta(days=30), None),
+        (Decimal(10), "USD", monday + timedelta(days=10), DEFAULT_TIER),
+    ])
+    assert results == [
+        (94000, 9400, monday),
+        None,
+        (12600, 1260, DAY),  # Saturday: Friday's base rate, 12.85 / 1.02 rounded
+        (94150, 9415, DAY),
+        None,
+        (95000, 9500, monday),
+    ]
+
+
+def test_decimal_amounts_are_rounded_with_rate_rounding(database_url, monkeypatch):
+    # 1.5 * 9315 = 13972.5 and 0.125 * 9315 = 1164.375: exact products, rounded once at the end
+    items = [(Decimal("1.5"), "USD", DAY, None), (Decimal("0.125"), "USD", DAY, None),
+             (Decimal("1250.40"), "USD", DAY, None)]
+    assert [r[0] for r in convert(database_url, items)] == [13973, 1164, 11647476]
+    monkeypatch.setattr(controllers, "RATE_ROUNDING", decimal.ROUND_HALF_EVEN)
+    assert [r[0] for r in convert(database_url, items)] == [13972, 1164, 11647476]
+
+
+def test_default_tier_converts_at_stored_rate(database_url):
+    async def main():
+        engine, sessions = await open_sessions(database_url)
+        try:
+            async with sessions() as session:
+                controller = CurrencyController(session)
+                await save_rates(controller, DAY, "94.15", "5.00")
+                row = await controller.get_rates_by_date(DAY)
+                results = list(await controller.convert_many([
+                    (Decimal(1000), "CNY", DAY, DEFAULT_TIER),
+                    (Decimal(1000), "USD", DAY, DEFAULT_TIER),
+                ]))
+                assert results == [
+                    (1000 * row.cny_rub_plus2p_fens, row.cny_rub_plus2p_fens, DAY),
+                    (1000 * row.ust_rub_plus1_cents, row.ust_rub_plus1_cents, DAY),
+                ]
+                assert results[0][1] == 500
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("method, url, body", [
+    ("POST", "/rates/convert", {"items": [{"amount": 1, "currency": "USD", "date": str(DAY), "tier": "no-such-tier"}]}),
+    ("GET", "/rates/markup?tier=bogus", None),
+])
+def test_unknown_tier_is_rejected(database_url, monkeypatch, method, url, body):
+    [response] = call_api(database_url, monkeypatch, [(method, url, body)])
+    assert response.status_code == 422
+
+
+def test_known_tiers_are_accepted(database_url, monkeypatch):
+    item = {"amount": 1, "currency": "USD", "date": str(DAY)}
+    responses = call_api(database_url, monkeypatch, [
+        ("POST", "/rates/convert", {"items": [item, {**item, "tier": None}, {**item, "tier": DEFAULT_TIER}]}),
+        ("GET", f"/rates/markup?tier={DEFAULT_TIER}", None),
+    ])
+    assert [r.status_code for r in responses] == [200, 200]
+
+
+@pytest.mark.parametrize("count", [1, 4, 5])
+@pytest.mark.parametrize("fmt", ["json", "ndjson"])
+def test_framing_across_chunks(database_url, monkeypatch, fmt, count):
+    monkeypatch.setattr(api, "CONVERSION_CHUNK_ITEMS", 2)
+    items = [{"amount": str(i + 1), "currency": "USD", "date": str(DAY)} for i in range(count)]
+    items[-1]["date"] = str(DAY - timedelta(days=1))
+    [response] = call_api(database_url, monkeypatch, [("POST", f"/rates/convert?format={fmt}", {"items": items})])
+    assert response.status_code == 200
+    if fmt == "json":
+        assert response.headers["content-type"] == "application/json"
+        results = response.json()
+    else:
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert response.text.endswith("\n") and "\n\n" not in response.text
+        results = [json.loads(line) for line in response.text.splitlines()]
+    expected = [{"amount_rub": float(from_minor(9415 * (i + 1))), "rate": 94.15, "rate_date": str(DAY)}
+                for i in range(count - 1)]
+    assert results == [*expected, None]
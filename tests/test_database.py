@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+import database
+
+
+class FakeConnection:
+    def __init__(self, engine: "FakeEngine"):
+        self.engine = engine
+
+    async def execute(self, statement):
+        pass
+
+    async def close(self):
+        self.engine.closed += 1
+
+
+class FakeEngine:
+    """Fails the `failing`-th connect."""
+
+    def __init__(self, failing: int):
+        self.failing = failing
+        self.connects = 0
+        self.closed = 0
+
+    async def connect(self):
+        self.connects += 1
+        if self.connects == self.failing:
+            raise ConnectionRefusedError("connection refused")
+        return FakeConnection(self)
+
+
+def test_warm_up_closes_connections_when_one_fails(monkeypatch):
+    engine = FakeEngine(failing=2)
+    monkeypatch.setattr(database, "DB_POOL_MODE", "queue")
+    monkeypatch.setattr(database, "_engine", engine)
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.run(database.warm_up_pool(3))
+    assert engine.connects == 3 and engine.closed == 2
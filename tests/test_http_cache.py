@@ -0,0 +1,41 @@
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+from http_cache import RenderedPage, accepts_gzip, page_response
+
+
+def request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("br;q=1.0, gzip;q=0.8", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.0, br", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("gzip;q=0, *", False),
+    ("identity", False),
+    ("", False),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+def test_representations_have_their_own_etags():
+    page = RenderedPage(b"<html>rates</html>" * 10)
+    plain = page_response(request(accept_encoding="identity"), page)
+    compressed = page_response(request(accept_encoding="gzip"), page)
+    assert plain.headers["etag"] != compressed.headers["etag"]
+    assert gzip.decompress(compressed.body) == page.body and plain.body == page.body
+
+    assert page_response(request(accept_encoding="gzip", if_none_match=compressed.headers["etag"]),
+                         page).status_code == 304
+    # A cached plain copy doesn't validate the compressed representation
+    assert page_response(request(accept_encoding="gzip", if_none_match=plain.headers["etag"]),
+                         page).status_code == 200
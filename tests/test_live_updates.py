@@ -0,0 +1,41 @@
+import asyncio
+
+from fastapi import FastAPI
+
+import api
+from broadcast import broadcaster
+
+
+def websocket_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(api.router)
+    return app
+
+
+def test_websocket_forwards_events_and_leaves_on_disconnect():
+    async def main():
+        incoming: asyncio.Queue = asyncio.Queue()
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "websocket", "path": "/ws/rates", "raw_path": b"/ws/rates", "query_string": b"",
+                 "headers": [], "subprotocols": [], "app": None}
+        await incoming.put({"type": "websocket.connect"})
+        connection = asyncio.create_task(websocket_app()(scope, incoming.get, send))
+
+        while not len(broadcaster):
+            await asyncio.sleep(0.01)
+        broadcaster.publish("reload", '{"count":3}')
+        while len(sent) < 2:
+            await asyncio.sleep(0.01)
+        assert sent[0]["type"] == "websocket.accept"
+        assert sent[1]["text"] == '{"event":"reload","data":{"count":3}}'
+
+        # The client goes away and no further event is published: the handler must notice by itself
+        await incoming.put({"type": "websocket.disconnect", "code": 1001})
+        await asyncio.wait_for(connection, timeout=2)
+        assert len(broadcaster) == 0
+
+    asyncio.run(main())
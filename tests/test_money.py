@@ -0,0 +1,99 @@
+import asyncio
+import json
+import random
+from datetime import date
+from decimal import Decimal
+
+from conftest import open_sessions
+from controllers import CurrencyController
+from markup import MarkupEngine, MarkupRule, DEFAULT_RULES
+from money import MINOR_UNITS, format_minor, from_minor, to_minor
+from serializers import encode_rate
+
+DAY = date(2024, 3, 1)
+
+
+def marked_values(low: str, high: str) -> list[Decimal]:
+    return [from_minor(m) for m in range(to_minor(low), to_minor(high) + 1)]
+
+
+def store(markups: MarkupEngine, usd: Decimal, cny: Decimal) -> dict:
+    """Column values for marked rates entered by the operator, as the bot saves them."""
+    base = (markups.remove("USD", DAY, usd), markups.remove("CNY", DAY, cny))
+    return CurrencyController._rate_values(*base, DAY, markups, marked=(usd, cny))
+
+
+def test_format_minor_matches_float_repr():
+    for minor in range(0, 100 * MINOR_UNITS):
+        assert format_minor(minor) == repr(minor / MINOR_UNITS)
+
+
+def test_to_minor_rounds_half_up():
+    assert to_minor(Decimal("12.345")) == 1235
+    assert to_minor(Decimal("12.344")) == 1234
+    assert to_minor("5") == 500
+
+
+def test_entered_marked_rates_are_stored_exactly():
+    markups = MarkupEngine(DEFAULT_RULES)
+    for cny in marked_values("5.00", "29.99"):
+        values = store(markups, Decimal("94.15"), cny)
+        assert values["cny_rub_plus2p_fens"] == to_minor(cny)
+        # The base rate is the nearest one to marked / 1.02
+        assert abs(values["cny_rub_fens"] - to_minor(cny) / Decimal("1.02")) <= Decimal("0.5")
+    for usd in marked_values("50.00", "149.99"):
+        values = store(markups, usd, Decimal("12.85"))
+        assert values["ust_rub_plus1_cents"] == to_minor(usd)
+        assert values["ust_rub_cents"] == to_minor(usd) - 100
+
+
+def test_marked_round_trip_property():
+    rng = random.Random(0)
+    for _ in range(2000):
+        rules = [
+            MarkupRule("USD", "add", from_minor(rng.randrange(0, 1000)), date(1970, 1, 1)),
+            MarkupRule("CNY", "mul", Decimal(1) + Decimal(rng.randrange(1, 500)).scaleb(-3), date(1970, 1, 1)),
+        ]
+        usd, cny = from_minor(rng.randrange(1000, 100000)), from_minor(rng.randrange(100, 10000))
+        values = store(MarkupEngine(rules), usd, cny)
+        assert from_minor(values["ust_rub_plus1_cents"]) == usd
+        assert from_minor(values["cny_rub_plus2p_fens"]) == cny
+
+
+def test_marked_rates_survive_saving_and_serialization(database_url):
+    async def main():
+        engine, sessions = await open_sessions(database_url)
+        try:
+            async with sessions() as session:
+                controller = CurrencyController(session)
+                markups = await controller.get_markup_engine()
+                for cny in marked_values("5.00", "5.20"):
+                    usd = Decimal("94.15")
+                    await controller.add_rates(markups.remove("USD", DAY, usd), markups.remove("CNY", DAY, cny),
+                                               DAY, marked=(usd, cny))
+                    body = json.loads(encode_rate(await controller.get_rates_by_date(DAY)))
+                    assert body["cny_rub_plus2p"] == float(cny)
+                    assert body["ust_rub_plus1"] == 94.15
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+def test_default_tier_markup_matches_stored_rates(database_url):
+    async def main():
+        engine, sessions = await open_sessions(database_url)
+        try:
+            async with sessions() as session:
+                controller = CurrencyController(session)
+                markups = await controller.get_markup_engine()
+                usd, cny = Decimal("94.15"), Decimal("5.00")
+                await controller.add_rates(markups.remove("USD", DAY, usd), markups.remove("CNY", DAY, cny),
+                                           DAY, marked=(usd, cny))
+                [row] = await controller.get_rates_with_markup(DAY, DAY)
+                assert row["ust_rub_markup"] == 94.15
+                assert row["cny_rub_markup"] == 5.0
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
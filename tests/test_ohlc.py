@@ -0,0 +1,83 @@
+import asyncio
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from conftest import open_sessions
+from controllers import CurrencyController, MANUAL_SOURCE
+
+# USD/RUB submissions over a week and a month boundary; Wednesday's arrive out of order
+SUBMISSIONS = [
+    (datetime(2024, 1, 26, 9), "90.00"),
+    (datetime(2024, 1, 26, 12), "92.00"),
+    (datetime(2024, 1, 26, 17), "91.00"),
+    (datetime(2024, 1, 28, 10), "91.50"),   # Sunday, still the week of Monday the 22nd
+    (datetime(2024, 1, 29, 8), "93.00"),
+    (datetime(2024, 1, 29, 15), "89.00"),
+    (datetime(2024, 1, 31, 11), "94.00"),
+    (datetime(2024, 1, 31, 9), "95.00"),
+    (datetime(2024, 2, 1, 10), "96.00"),
+    (datetime(2024, 2, 1, 12), "97.00"),
+]
+
+
+def ohlc(database_url: str, *requests: tuple) -> list:
+    """Record SUBMISSIONS plus one imported Friday, then fetch get_ohlc(*request) for each request."""
+    async def main():
+        engine, sessions = await open_sessions(database_url)
+        try:
+            async with sessions() as session:
+                controller = CurrencyController(session)
+                markups = await controller.get_markup_engine()
+                for at, usd in SUBMISSIONS:
+                    values = controller._rate_values(Decimal(usd), Decimal("12.85"), at.date(), markups)
+                    await controller._record_observations([values], MANUAL_SOURCE, at.replace(tzinfo=timezone.utc))
+                await session.commit()
+                await controller.add_rates_many([(date(2024, 1, 26), Decimal("88.00"), Decimal("12.50"))],
+                                                source="import")
+            async with sessions() as session:
+                controller = CurrencyController(session)
+                return [[tuple(bar) for bar in await controller.get_ohlc("USD/RUB", *request)]
+                        for request in requests]
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_daily_bars_follow_intraday_submissions(database_url):
+    [bars] = ohlc(database_url, ("day", None, None, MANUAL_SOURCE))
+    # (period, source, open, high, low, close, sum, count)
+    assert bars == [
+        (date(2024, 1, 26), "manual", 9000, 9200, 9000, 9100, 27300, 3),
+        (date(2024, 1, 28), "manual", 9150, 9150, 9150, 9150, 9150, 1),
+        (date(2024, 1, 29), "manual", 9300, 9300, 8900, 8900, 18200, 2),
+        (date(2024, 1, 31), "manual", 9500, 9500, 9400, 9400, 18900, 2),
+        (date(2024, 2, 1), "manual", 9600, 9700, 9600, 9700, 19300, 2),
+    ]
+
+
+def test_weekly_bars_start_on_monday(database_url):
+    [bars] = ohlc(database_url, ("week", None, None, MANUAL_SOURCE))
+    assert bars == [
+        (date(2024, 1, 22), "manual", 9000, 9200, 9000, 9150, 36450, 4),
+        (date(2024, 1, 29), "manual", 9300, 9700, 8900, 9700, 56400, 6),
+    ]
+
+
+def test_monthly_bars_and_range(database_url):
+    months, clipped = ohlc(database_url, ("month", None, None, MANUAL_SOURCE),
+                           ("month", date(2024, 1, 28), date(2024, 1, 31), MANUAL_SOURCE))
+    assert months == [
+        (date(2024, 1, 1), "manual", 9000, 9500, 8900, 9400, 73550, 8),
+        (date(2024, 2, 1), "manual", 9600, 9700, 9600, 9700, 19300, 2),
+    ]
+    # Open and close come from the first and last days inside the range
+    assert clipped == [(date(2024, 1, 1), "manual", 9150, 9500, 8900, 9400, 46250, 5)]
+
+
+def test_sources_are_kept_apart(database_url):
+    [bars] = ohlc(database_url, ("week", None, date(2024, 1, 28), None))
+    assert bars == [
+        (date(2024, 1, 22), "import", 8800, 8800, 8800, 8800, 8800, 1),
+        (date(2024, 1, 22), "manual", 9000, 9200, 9000, 9150, 36450, 4),
+    ]
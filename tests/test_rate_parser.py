@@ -0,0 +1,118 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from rate_parser import RateParseError, parse_number, parse_rates
+
+REFERENCE = {"USD": Decimal("94.15"), "CNY": Decimal("12.85")}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("93.15", "93.15"),
+    ("93,15", "93.15"),
+    ("1 093,15", "1093.15"),
+    ("1 093,15", "1093.15"),
+    ("1'093.15", "1093.15"),
+    ("1.093,15", "1093.15"),
+    ("1,093.15", "1093.15"),
+    ("1.093.150", "1093150"),
+    ("−5", "-5"),
+])
+def test_parse_number(text, expected):
+    assert parse_number(text) == Decimal(expected)
+
+
+def test_parse_number_rejects_garbage():
+    with pytest.raises(RateParseError):
+        parse_number("9.3e")
+
+
+@pytest.mark.parametrize("text", [
+    "USD 93,15 CNY 12,85",
+    "usd: 93.15, cny: 12.85",
+    "CNY 12,85 USD 93,15",
+    "93.15 USD 12.85 CNY",
+    "93,15$ 12,85¥",
+    "доллар 93,15 юань 12,85",
+    "rates for august: UST 93.15 RMB 12.85",
+])
+def test_labelled(text):
+    parsed = parse_rates(text)
+    assert parsed.rates == {"USD": Decimal("93.15"), "CNY": Decimal("12.85")}
+    assert parsed.labelled
+
+
+@pytest.mark.parametrize("text", ["93.15 12.85", "93,15 12,85", "93.15-12.85", "93,15\n12,85", "12.85 93.15"])
+def test_unlabelled(text):
+    parsed = parse_rates(text)
+    assert parsed.rates == {"USD": Decimal("93.15"), "CNY": Decimal("12.85")}
+    assert not parsed.labelled
+
+
+def test_unlabelled_matched_to_references():
+    # Without references the larger value is USD; with them, the closer one is
+    parsed = parse_rates("12 10", reference={"USD": Decimal("9.5"), "CNY": Decimal("12.5")})
+    assert parsed.rates == {"USD": Decimal("10"), "CNY": Decimal("12")}
+
+
+def test_ambiguous_thousands_assigned_by_total_distance():
+    parsed = parse_rates("1 093,15 12,85", reference=REFERENCE)
+    assert parsed.rates == {"USD": Decimal("1093.15"), "CNY": Decimal("12.85")}
+    assert [w.split(":")[0] for w in parsed.warnings] == ["USD"]
+
+
+@pytest.mark.parametrize("text", [
+    "93.15",
+    "93.15 12.85 7.1",
+    "USD 93.15 USD 94",
+    "EUR 101 93.15",
+    "USD 93.15 CNY",
+    "0 12.85",
+    "USD -93.15 CNY 12.85",
+    "",
+])
+def test_rejected(text):
+    with pytest.raises(RateParseError):
+        parse_rates(text)
+
+
+def test_deviation_warning():
+    parsed = parse_rates("USD 120 CNY 12.9", reference=REFERENCE)
+    assert len(parsed.warnings) == 1 and parsed.warnings[0].startswith("USD")
+
+
+def format_rate(rng: random.Random, value: Decimal) -> str:
+    text = f"{value:.2f}"
+    return text.replace(".", ",") if rng.random() < 0.5 else text
+
+
+def test_generated_messages_round_trip():
+    rng = random.Random(0)
+    for _ in range(2000):
+        usd = Decimal(rng.randrange(5000, 15000)).scaleb(-2)
+        cny = Decimal(rng.randrange(500, 3000)).scaleb(-2)
+        usd_text, cny_text = format_rate(rng, usd), format_rate(rng, cny)
+        separator = rng.choice([" ", "  ", "\n", "; ", " / "])
+        style = rng.randrange(3)
+        if style == 0:
+            text = f"{usd_text}{separator}{cny_text}"
+        elif style == 1:
+            text = f"USD {usd_text}{separator}CNY {cny_text}"
+        else:
+            text = f"{cny_text} юаня{separator}{usd_text} $"
+        parsed = parse_rates(text, reference=REFERENCE)
+        assert parsed.rates == {"USD": usd, "CNY": cny}, text
+
+
+def test_random_input_fails_cleanly():
+    rng = random.Random(1)
+    alphabet = "0123456789.,-−+ $¥USDCNYusdcny юаньдоллар'\n"
+    for _ in range(5000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randrange(30)))
+        try:
+            parsed = parse_rates(text, reference=REFERENCE)
+        except RateParseError:
+            continue
+        assert set(parsed.rates) == {"USD", "CNY"}
+        assert all(value > 0 for value in parsed.rates.values())
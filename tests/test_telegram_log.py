@@ -0,0 +1,110 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+import logger
+from logger import MAX_MESSAGE_LENGTH, TelegramLogHandler
+
+
+class FakeTelegram:
+    """A local Bot API answering sendMessage with the scripted (status, body) replies, then 200."""
+
+    def __init__(self, replies: list[tuple[int, dict]] | None = None):
+        self.replies = replies or []
+        self.messages: list[tuple[float, str]] = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+                fake.messages.append((time.monotonic(), form["text"][0]))
+                status, body = fake.replies.pop(0) if fake.replies else (200, {"ok": True, "result": {}})
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def texts(self) -> list[str]:
+        return [text for _, text in self.messages]
+
+
+@pytest.fixture
+def telegram(monkeypatch):
+    monkeypatch.setattr(logger, "MIN_SEND_INTERVAL", 0)
+    fake = FakeTelegram()
+    yield fake
+    fake.server.shutdown()
+    fake.server.server_close()
+
+
+@pytest.fixture
+def handler(telegram):
+    # A long interval: records are only sent by flush() and close()
+    handler = TelegramLogHandler("42:test", "-100", interval=60, api_url=telegram.url)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    yield handler
+    handler.close()
+
+
+def log(handler: TelegramLogHandler, message: str, name: str = "bot") -> None:
+    handler.handle(logging.makeLogRecord({"name": name, "levelname": "ERROR", "levelno": logging.ERROR,
+                                          "msg": message}))
+
+
+def test_merges_repeated_records(telegram, handler):
+    for _ in range(3):
+        log(handler, "База недоступна")
+    log(handler, "Другая ошибка")
+    handler.flush()
+    [text] = telegram.texts
+    assert "*ERROR* из `bot` (×3)" in text
+    assert text.count("База недоступна") == 1 and text.count("Другая ошибка") == 1
+
+
+def test_splits_batches_at_the_message_limit(telegram, handler):
+    messages = [f"{i}" * 1500 for i in range(5)]
+    for message in messages:
+        log(handler, message)
+    handler.flush()
+    assert len(telegram.texts) == 3
+    assert all(len(text) <= MAX_MESSAGE_LENGTH for text in telegram.texts)
+    sent = "".join(telegram.texts)
+    assert all(message in sent for message in messages)
+
+
+def test_truncates_a_single_oversized_record(telegram, handler):
+    log(handler, "x" * 10000)
+    handler.flush()
+    [text] = telegram.texts
+    assert len(text) <= MAX_MESSAGE_LENGTH and "…" in text
+
+
+def test_honours_retry_after(telegram, handler):
+    telegram.replies = [(429, {"ok": False, "error_code": 429, "parameters": {"retry_after": 1}})]
+    log(handler, "База недоступна")
+    handler.flush()
+    (first, text), (second, retried) = telegram.messages
+    assert retried == text
+    assert second - first >= 1
+
+
+def test_close_sends_pending_records(telegram, handler):
+    log(handler, "Перед остановкой")
+    handler.close()
+    [text] = telegram.texts
+    assert "Перед остановкой" in text
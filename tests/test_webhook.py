@@ -0,0 +1,122 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage
+from fastapi import FastAPI
+from sqlalchemy import select
+
+import bot
+import database
+import webhook
+from conftest import open_sessions
+from models import AnnouncementChats
+
+SECRET = "test-secret"
+OPERATOR_ID = 1
+
+
+class RecordingSession(BaseSession):
+    """Answers Bot API calls locally and records them."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        result = True
+        if isinstance(method, SendMessage):
+            result = {
+                "message_id": len(self.calls),
+                "date": int(time.time()),
+                "chat": {"id": method.chat_id, "type": "group"},
+                "text": method.text,
+            }
+        return self.check_response(bot, method, 200, json.dumps({"ok": True, "result": result})).result
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def telegram(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "42:test")
+    monkeypatch.setenv("TARGET_USER_ID", str(OPERATOR_ID))
+    monkeypatch.setenv("MANAGER_CHAT_ID", "2")
+    monkeypatch.setattr(webhook, "BOT_WEBHOOK_URL", "https://rates.test")
+    monkeypatch.setattr(webhook, "BOT_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(webhook, "recent_updates", webhook.RecentUpdates())
+    bot.get_settings.cache_clear()
+    bot.get_bot.cache_clear()
+    session = RecordingSession()
+    bot.get_bot().session = session
+    yield session
+    bot.get_settings.cache_clear()
+    bot.get_bot.cache_clear()
+
+
+def update(update_id: int, text: str, chat_id: int = -100) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "group", "title": "Managers"},
+            "from": {"id": OPERATOR_ID, "is_bot": False, "first_name": "Operator"},
+            "text": text,
+        },
+    }
+
+
+def post_updates(database_url: str, requests: list[tuple[dict, dict]], monkeypatch):
+    """POST each (headers, update) to the webhook, wait for the handlers; returns (responses, subscribed chats)."""
+    app = FastAPI()
+    app.include_router(webhook.router)
+
+    async def main():
+        engine, sessions = await open_sessions(database_url)
+        monkeypatch.setattr(database, "async_session", sessions)
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                responses = [await client.post(webhook.WEBHOOK_PATH, headers=headers, json=body)
+                             for headers, body in requests]
+            await asyncio.gather(*webhook.handler_tasks)
+            async with sessions() as session:
+                chats = (await session.execute(select(AnnouncementChats.chat_id))).scalars().all()
+            return responses, chats
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Telegram-Bot-Api-Secret-Token": "wrong"}])
+def test_rejects_missing_or_wrong_secret(telegram, database_url, monkeypatch, headers):
+    responses, chats = post_updates(database_url, [(headers, update(1, "/subscribe"))], monkeypatch)
+    assert responses[0].status_code == 403
+    assert chats == [] and telegram.calls == []
+
+
+def test_dispatches_updates_to_handlers(telegram, database_url, monkeypatch):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    responses, chats = post_updates(database_url, [(headers, update(1, "/subscribe"))], monkeypatch)
+    assert responses[0].status_code == 200
+    assert chats == [-100]
+    [reply] = telegram.calls
+    assert isinstance(reply, SendMessage) and reply.chat_id == -100
+
+
+def test_skips_redelivered_updates(telegram, database_url, monkeypatch):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    requests = [(headers, update(7, "/subscribe")), (headers, update(7, "/subscribe"))]
+    responses, _ = post_updates(database_url, requests, monkeypatch)
+    assert [r.status_code for r in responses] == [200, 200]
+    assert len(telegram.calls) == 1
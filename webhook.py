@@ -0,0 +1,97 @@
+import asyncio
+import hmac
+import os
+from collections import OrderedDict
+
+from fastapi import APIRouter, HTTPException, Request
+
+from logger import setup_logger
+
+logger = setup_logger(__name__, level="INFO")
+
+# Webhook mode is on when the public base URL of the API is configured
+BOT_WEBHOOK_URL = os.getenv("BOT_WEBHOOK_URL", "").rstrip("/")
+BOT_WEBHOOK_SECRET = os.getenv("BOT_WEBHOOK_SECRET", "")
+WEBHOOK_PATH = "/telegram/webhook"
+RECENT_UPDATES = 1000
+
+router = APIRouter()
+
+
+class RecentUpdates:
+    """Remembers the last `size` update ids, since Telegram redelivers updates it considers unanswered."""
+
+    def __init__(self, size: int = RECENT_UPDATES):
+        self.size = size
+        self._ids: OrderedDict[int, None] = OrderedDict()
+
+    def seen(self, update_id: int) -> bool:
+        if update_id in self._ids:
+            return True
+        self._ids[update_id] = None
+        if len(self._ids) > self.size:
+            self._ids.popitem(last=False)
+        return False
+
+
+recent_updates = RecentUpdates()
+handler_tasks: set[asyncio.Task] = set()
+
+
+def webhook_enabled() -> bool:
+    return bool(BOT_WEBHOOK_URL)
+
+
+async def start_webhook() -> None:
+    if not BOT_WEBHOOK_SECRET:
+        raise RuntimeError("BOT_WEBHOOK_SECRET must be set to run the bot in webhook mode")
+
+    import bot as telegram_bot
+
+    await telegram_bot.get_bot().set_webhook(
+        url=BOT_WEBHOOK_URL + WEBHOOK_PATH,
+        secret_token=BOT_WEBHOOK_SECRET,
+        allowed_updates=telegram_bot.dp.resolve_used_update_types(),
+    )
+    telegram_bot.start_scheduler()
+    logger.info("🚀 Бот запущен в режиме webhook")
+
+
+async def stop_webhook() -> None:
+    import bot as telegram_bot
+
+    if handler_tasks:
+        await asyncio.wait(handler_tasks, timeout=10)
+    telegram_bot.get_scheduler().shutdown(wait=False)
+    await telegram_bot.get_leader().stop()
+    await telegram_bot.get_bot().session.close()
+
+
+async def _process_update(telegram_bot, update) -> None:
+    try:
+        await telegram_bot.dp.feed_update(telegram_bot.get_bot(), update)
+    except Exception as e:
+        logger.error(f"❌ Ошибка обработки обновления {update.update_id}: {e}")
+
+
+@router.post(WEBHOOK_PATH, include_in_schema=False)
+async def telegram_webhook(request: Request):
+    if not webhook_enabled():
+        raise HTTPException(status_code=404)
+
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not hmac.compare_digest(token, BOT_WEBHOOK_SECRET):
+        raise HTTPException(status_code=403)
+
+    import bot as telegram_bot
+    from aiogram.types import Update
+
+    update = Update.model_validate(await request.json(), context={"bot": telegram_bot.get_bot()})
+    if recent_updates.seen(update.update_id):
+        return {"ok": True}
+
+    # Answer right away and handle in the background so slow handlers don't trigger redeliveries
+    task = asyncio.create_task(_process_update(telegram_bot, update))
+    handler_tasks.add(task)
+    task.add_done_callback(handler_tasks.discard)
+    return {"ok": True}